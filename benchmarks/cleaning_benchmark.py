@@ -0,0 +1,79 @@
+"""Chunk count / embedding time with and without boilerplate stripping.
+
+Usage:
+    python benchmarks/cleaning_benchmark.py
+    python benchmarks/cleaning_benchmark.py aapl-10k-2022.pdf msft-10k-2022.pdf --chunk-size 500
+
+Without PDFs a synthetic 10-K is generated whose pages carry a running
+header, a page-numbered footer and a table of contents, as extracted filings do.
+"""
+import sys
+from pathlib import Path
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.append(str(project_root))
+
+import argparse
+import random
+import time
+
+from pypdf import PdfReader
+
+from src.chunking import chunk_document
+from src.embeddings import get_embedding_model
+from src.text_cleaning import strip_boilerplate
+
+SAMPLE_ITEMS = [
+    ("1", "Business"), ("1A", "Risk Factors"), ("7", "Management's Discussion and Analysis"),
+    ("7A", "Quantitative and Qualitative Disclosures About Market Risk"), ("8", "Financial Statements"),
+]
+SAMPLE_WORDS = ("net sales revenue increased compared fiscal year primarily driven higher demand services products "
+                "margin operating expenses foreign currency interest rate risk customers supply chain").split()
+
+
+def synthetic_filing(n_pages: int = 60, seed: int = 0):
+    rng = random.Random(seed)
+    pages = ["Table of Contents\n" + "\n".join(
+        f"Item {item}. {title} {'.' * 12} {3 + 10 * i}" for i, (item, title) in enumerate(SAMPLE_ITEMS))]
+    for n in range(1, n_pages):
+        lines = ["Example Corp. | 2022 Form 10-K", "Table of Contents"]
+        if n % (n_pages // len(SAMPLE_ITEMS)) == 1:
+            item, title = SAMPLE_ITEMS[min(n // (n_pages // len(SAMPLE_ITEMS)), len(SAMPLE_ITEMS) - 1)]
+            lines.append(f"Item {item}. {title}")
+        for _ in range(12):
+            lines.append(" ".join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(8, 16))) + ".")
+        lines.append(f"Example Corp. | 2022 Form 10-K | {n}")
+        pages.append("\n".join(lines))
+    return pages
+
+
+def measure(model, pages, chunk_size):
+    chunks, _ = chunk_document("\n".join(pages) + "\n", chunk_size)
+    start = time.perf_counter()
+    model.encode(chunks)
+    return len(chunks), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="Annual report PDFs")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.pdfs:
+        filings = [(Path(p).name, [page.extract_text() for page in PdfReader(p).pages]) for p in args.pdfs]
+    else:
+        filings = [("synthetic", synthetic_filing())]
+
+    model = get_embedding_model()
+    print(f"{'filing':<28}{'lines cut':>10}{'chunks':>14}{'reduction':>11}{'embed s':>16}")
+    for name, pages in filings:
+        raw_chunks, raw_seconds = measure(model, pages, args.chunk_size)
+        cleaned, stats = strip_boilerplate(pages)
+        clean_chunks, clean_seconds = measure(model, cleaned, args.chunk_size)
+        print(f"{name[:27]:<28}{stats['lines_removed']:>10}{raw_chunks:>7} -> {clean_chunks:<4}"
+              f"{1 - clean_chunks / max(raw_chunks, 1):>10.1%}{raw_seconds:>8.2f} -> {clean_seconds:<5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Throughput and parity of the embedding backends against PyTorch.
+
+Usage:
+    python benchmarks/encoder_benchmark.py
+    python benchmarks/encoder_benchmark.py --pdf aapl-10k-2022.pdf --batch-sizes 16 32 64 --threads 4
+
+Every backend encodes the same chunks; parity is the cosine similarity of
+each embedding with the torch embedding of the same chunk and must stay
+at or above 0.99. ONNX backends need sentence-transformers >= 3.2 with
+optimum[onnxruntime] installed.
+"""
+import sys
+from pathlib import Path
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+
+import numpy as np
+from pypdf import PdfReader
+
+from benchmarks.cleaning_benchmark import synthetic_filing
+from src.chunking import chunk_document
+from src.embeddings import ENCODER_BACKENDS, Encoder
+
+PARITY_THRESHOLD = 0.99
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="Annual report whose chunks are encoded")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--threads", type=int, help="Intra-op threads for every backend")
+    args = parser.parse_args()
+
+    if args.pdf:
+        pages = [page.extract_text() for page in PdfReader(args.pdf).pages]
+    else:
+        pages = synthetic_filing(120)
+    chunks, _ = chunk_document("\n".join(pages), args.chunk_size)
+    print(f"chunks={len(chunks)} chunk_size={args.chunk_size} threads={args.threads or 'default'}")
+
+    reference = None
+    baseline = None
+    print(f"\n{'backend':<12}{'batch':>6}{'chunks/s':>10}{'speedup':>9}{'min cos':>9}{'mean cos':>10}  parity")
+    for backend in ENCODER_BACKENDS:
+        encoder = Encoder(backend=backend, threads=args.threads)
+        if encoder.backend != backend:
+            print(f"{backend:<12}  unavailable")
+            continue
+        encoder.encode(chunks[:8])  # warm-up
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            embeddings = np.asarray(encoder.encode(chunks, batch_size=batch_size), dtype='float32')
+            rate = len(chunks) / (time.perf_counter() - start)
+            if reference is None:
+                reference, baseline = embeddings, rate
+            cosines = cosine_rows(embeddings, reference)
+            print(f"{backend:<12}{batch_size:>6}{rate:>10.1f}{rate / baseline:>8.2f}x{cosines.min():>9.4f}{cosines.mean():>10.4f}"
+                  f"  {'ok' if cosines.min() >= PARITY_THRESHOLD else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Hit-rate benchmark: dense-only vs hybrid (BM25 + dense, RRF) retrieval.
+
+Usage:
+    python benchmarks/hybrid_retrieval_benchmark.py
+    python benchmarks/hybrid_retrieval_benchmark.py --labels my_labels.json --k 3
+
+A labels file is JSON of the form
+    {"chunks": ["...", ...], "queries": [{"query": "...", "relevant": [0, 4]}, ...]}
+Without one, a small built-in set of 10-K style passages is used.
+"""
+import sys
+from pathlib import Path
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.append(str(project_root))
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from src.document_processor import DocumentProcessor
+from src.embedding_cache import EmbeddingCache
+from src.index_cache import IndexCache
+
+SAMPLE_CHUNKS = [
+    "Greater China net sales increased 9% compared to 2021 due primarily to higher net sales of iPhone and Services.",
+    "Europe net sales increased during 2022 compared to 2021 due primarily to higher net sales of iPhone, partially offset by currency weakness.",
+    "Americas net sales increased 11% during 2022 due primarily to higher net sales of iPhone and Services.",
+    "Item 1A. Risk Factors. The Company's business, reputation, results of operations and financial condition can be affected by a number of factors.",
+    "Item 7A. Quantitative and Qualitative Disclosures About Market Risk. The Company is exposed to interest rate and foreign currency risk.",
+    "Item 1. Business. The Company designs, manufactures and markets smartphones, personal computers, tablets, wearables and accessories.",
+    "Research and development expense was $26.3 billion in 2022, an increase of 20% driven by headcount-related expenses.",
+    "Selling, general and administrative expense was $25.1 billion in 2022, an increase of 14% compared to 2021.",
+    "The Company repurchased $90.2 billion of its common stock and paid dividends and dividend equivalents of $14.8 billion.",
+    "Gross margin percentage for Products was 36.3% in 2022 compared to 35.3% in 2021, driven by cost savings and a favourable mix.",
+    "The provision for income taxes was $19.3 billion with an effective tax rate of 16.2% for 2022.",
+    "The Company has commercial paper outstanding of $10.0 billion with a weighted-average interest rate of 1.58%.",
+    "Wearables, Home and Accessories net sales increased due primarily to higher net sales of AirPods and Apple Watch.",
+    "Item 8. Financial Statements and Supplementary Data. Consolidated Statements of Operations.",
+    "Japan net sales decreased 9% during 2022 compared to 2021 due to the weakness of the yen relative to the U.S. dollar.",
+    "Rest of Asia Pacific net sales increased due primarily to higher net sales of iPhone and Mac.",
+]
+
+SAMPLE_QUERIES = [
+    {"query": "Greater China net sales", "relevant": [0]},
+    {"query": "Item 1A", "relevant": [3]},
+    {"query": "Item 7A market risk", "relevant": [4]},
+    {"query": "R&D expense in 2022", "relevant": [6]},
+    {"query": "SG&A expense", "relevant": [7]},
+    {"query": "share repurchases and dividends", "relevant": [8]},
+    {"query": "effective tax rate 16.2%", "relevant": [10]},
+    {"query": "commercial paper", "relevant": [11]},
+    {"query": "AirPods and Apple Watch sales", "relevant": [12]},
+    {"query": "Item 8 financial statements", "relevant": [13]},
+    {"query": "Japan yen weakness", "relevant": [14]},
+    {"query": "Products gross margin percentage", "relevant": [9]},
+]
+
+
+def hit_rate(processor, queries, k):
+    start = time.perf_counter()
+    results = processor.search_batch_ids([q["query"] for q in queries], k)
+    elapsed = time.perf_counter() - start
+    hits = sum(bool(set(ids) & set(q["relevant"])) for ids, q in zip(results, queries))
+    return hits / len(queries), 1000 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="JSON file with chunks and labelled queries")
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.labels:
+        with open(args.labels, "r") as f:
+            labels = json.load(f)
+        chunks, queries = labels["chunks"], labels["queries"]
+    else:
+        chunks, queries = SAMPLE_CHUNKS, SAMPLE_QUERIES
+
+    # Throwaway caches, so benchmark vectors never reach (or warm up) the app's caches
+    with tempfile.TemporaryDirectory() as cache_dir:
+        processor = DocumentProcessor(cache=IndexCache(os.path.join(cache_dir, "index_cache")),
+                                      embedding_cache=EmbeddingCache(os.path.join(cache_dir, "embedding_cache.sqlite")))
+        processor.chunks = chunks
+        processor.create_index()
+
+        start = time.perf_counter()
+        processor.build_keyword_index()
+        bm25_build_ms = 1000 * (time.perf_counter() - start)
+
+        hybrid = hit_rate(processor, queries, args.k)
+        keyword_index, processor.bm25 = processor.bm25, None
+        dense = hit_rate(processor, queries, args.k)
+        processor.bm25 = keyword_index
+        processor.embedding_cache.close()
+
+    print(f"chunks={len(chunks)} queries={len(queries)} k={args.k} bm25 build={bm25_build_ms:.2f}ms")
+    print(f"{'mode':<10}{'hit@' + str(args.k):>10}{'ms/query':>12}")
+    print(f"{'dense':<10}{dense[0]:>10.3f}{dense[1]:>12.3f}")
+    print(f"{'hybrid':<10}{hybrid[0]:>10.3f}{hybrid[1]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import json
+import re
+from typing import Dict, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.pydantic_models import DocumentAnswer
+
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# Headings of the pre-JSON numbered answer format, tolerant of markdown emphasis and numbering drift
+LEGACY_HEADINGS = {
+    "key_findings": r"key\s+findings",
+    "detailed_analysis": r"detailed\s+analysis",
+    "summary": r"summary|conclusion",
+}
+LEGACY_SECTION = re.compile(
+    r"^[\s#*]*(?:\d+\.\s*)?[*_]*(" + "|".join(LEGACY_HEADINGS.values()) + r")[*_]*\s*:?[*_]*\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+ANSWER_FIELDS = frozenset(DocumentAnswer.model_fields)
+KEY_ALIASES = {
+    "findings": "key_findings",
+    "key_points": "key_findings",
+    "analysis": "detailed_analysis",
+    "details": "detailed_analysis",
+    "conclusion": "summary",
+}
+
+
+def close_json(text: str) -> str:
+    """Close strings, arrays and objects left open by a truncated completion"""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+def repair_json(raw: str) -> Optional[Dict]:
+    """Best-effort local fix of near-miss JSON: code fences, prose around the object,
+    trailing commas, raw newlines in strings and truncation"""
+    text = CODE_FENCE.sub("", raw.strip())
+    start = text.find("{")
+    if start < 0:
+        return None
+    end = text.rfind("}")
+    candidates = [text[start:end + 1]] if end > start else []
+    candidates.append(close_json(text[start:]))
+    for candidate in candidates:
+        try:
+            data = json.loads(TRAILING_COMMA.sub(r"\1", candidate), strict=False)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def normalize_keys(data: Dict) -> Dict:
+    normalized = {}
+    for key, value in data.items():
+        key = re.sub(r"[^a-z]+", "_", str(key).lower()).strip("_")
+        normalized.setdefault(KEY_ALIASES.get(key, key), value)
+    # A single level of nesting, e.g. {"answer": {...}} or {"structured_analysis": {...}}
+    if len(normalized) == 1 and isinstance(next(iter(normalized.values())), dict):
+        return normalize_keys(next(iter(normalized.values())))
+    return normalized
+
+
+def parse_legacy(raw: str) -> Optional[Dict]:
+    """Sections of an answer written in the numbered heading format instead of JSON"""
+    matches = list(LEGACY_SECTION.finditer(raw))
+    sections = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        heading = match.group(1).lower()
+        field = next(f for f, pattern in LEGACY_HEADINGS.items() if re.fullmatch(pattern, heading))
+        sections.setdefault(field, raw[match.end():following.start() if following else len(raw)].strip())
+    return sections or None
+
+
+def parse_answer(raw: str) -> Tuple[DocumentAnswer, str]:
+    """Validate a completion against DocumentAnswer, repairing it locally if needed.
+
+    Never raises: returns the answer and how it was obtained, one of
+    "valid", "repaired", "legacy" or "text" (the raw completion kept as the analysis).
+    """
+    raw = raw or ""
+    try:
+        return DocumentAnswer.model_validate_json(raw), "valid"
+    except ValidationError:
+        pass
+
+    for status, data in (("repaired", repair_json(raw)), ("legacy", parse_legacy(raw))):
+        if not data:
+            continue
+        data = normalize_keys(data)
+        if not ANSWER_FIELDS & data.keys():
+            # Unrecognised keys: keep their text as the analysis rather than an empty answer
+            texts = [value.strip() for value in data.values() if isinstance(value, str) and value.strip()]
+            if not texts:
+                continue
+            data = {"detailed_analysis": "\n\n".join(texts)}
+        data.setdefault("key_findings", [])
+        data.setdefault("summary", "")
+        data.setdefault("detailed_analysis", "")
+        try:
+            return DocumentAnswer.model_validate(data), status
+        except ValidationError:
+            continue
+
+    return DocumentAnswer(key_findings=[], detailed_analysis=raw.strip(), summary=""), "text"
@@ -0,0 +1,74 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+# Keeps numbers ("2022", "1.5", "10-k") and item labels ("1a") as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were what which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index scored with Okapi BM25.
+
+    Complements the dense FAISS index for exact terms such as segment names,
+    line items and item numbers that sentence embeddings blur together.
+    """
+
+    def __init__(self, documents: Sequence[str] = (), k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        self.avg_length = 0.0
+        if documents:
+            self.add(documents)
+
+    def add(self, documents: Sequence[str]) -> None:
+        for text in documents:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize(text)
+            for term, freq in Counter(tokens).items():
+                self.postings[term].append((doc_id, freq))
+            self.doc_lengths.append(len(tokens))
+        self.avg_length = sum(self.doc_lengths) / max(len(self.doc_lengths), 1)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - n + 0.5) / (n + 0.5))
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Collection[int]] = None) -> List[Tuple[int, float]]:
+        """Return up to k (doc id, score) pairs, best first, optionally only among allowed IDs"""
+        if allowed is not None and not isinstance(allowed, (set, frozenset)):
+            allowed = set(int(i) for i in allowed)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, freq in postings:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """Fuse several ranked ID lists; k=60 is the constant from the original RRF paper"""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,144 @@
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable
+
+from src.settings import get_setting
+
+DEFAULT_WORKERS = 2
+# Rendered images kept per process, least recently used dropped first
+DEFAULT_CACHE_SIZE = 128
+# Longest a report waits on one chart before drawing a placeholder instead
+DEFAULT_RENDER_TIMEOUT = 60
+
+
+def _render(figure_json: str, image_format: str, width: Optional[int], height: Optional[int], scale: float) -> bytes:
+    # Runs in a pool process, whose kaleido instance stays warm between charts
+    return pio.from_json(figure_json).to_image(format=image_format, width=width, height=height, scale=scale)
+
+
+class ChartRenderer:
+    """Pool of worker processes turning Plotly figures into image bytes.
+
+    Kaleido serialises exports within a process, so each worker is a process
+    of its own. ``submit`` returns immediately with a future; a figure that
+    is identical to one rendered (or being rendered) before shares its result.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._executor = self._new_executor()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked, since the parent runs Streamlit's threads
+        return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @staticmethod
+    def figure_key(figure_json: str, image_format: str, width: Optional[int], height: Optional[int], scale: float) -> str:
+        return hashlib.sha256(f"{image_format}:{width}:{height}:{scale}:{figure_json}".encode()).hexdigest()
+
+    def submit(self, fig: go.Figure, image_format: str = "png", width: Optional[int] = None,
+               height: Optional[int] = None, scale: float = 1.0) -> Future:
+        """Future of the figure's image bytes, rendered in the pool unless cached"""
+        figure_json = fig.to_json()
+        key = self.figure_key(figure_json, image_format, width, height, scale)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(self._cache[key])
+                return future
+            if key in self._pending:
+                self.hits += 1
+                return self._pending[key]
+            self.misses += 1
+            try:
+                future = self._executor.submit(_render, figure_json, image_format, width, height, scale)
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool for good; start a fresh one and retry once
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                future = self._executor.submit(_render, figure_json, image_format, width, height, scale)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def _store(self, key: str, future: Future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._cache[key] = future.result()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render(self, figs: List[go.Figure], image_format: str = "png") -> List[bytes]:
+        """Render several figures in parallel, in order"""
+        futures = [self.submit(fig, image_format) for fig in figs]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ChartImage(Flowable):
+    """ReportLab image whose bytes come from a render future, resolved only when drawn.
+
+    Building a report submits every chart first, so they render in parallel
+    while the remaining flowables are assembled.
+    """
+
+    def __init__(self, future: Future, width: float, height: float, timeout: float = DEFAULT_RENDER_TIMEOUT):
+        super().__init__()
+        self.future = future
+        self.timeout = timeout
+        # Set when a placeholder was drawn instead of the chart
+        self.failed = False
+        self.width = width
+        self.height = height
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        try:
+            image = ImageReader(BytesIO(self.future.result(timeout=self.timeout)))
+        except TimeoutError:
+            self.failed = True
+            self.canv.drawString(0, self.height / 2, f"Chart unavailable: not rendered within {self.timeout:g}s")
+            return
+        except Exception as e:
+            # A failed chart should not cost the whole report
+            self.failed = True
+            self.canv.drawString(0, self.height / 2, f"Chart unavailable: {e}")
+            return
+        self.canv.drawImage(image, 0, 0, self.width, self.height, mask="auto")
+
+
+_renderer: Optional[ChartRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_chart_renderer() -> ChartRenderer:
+    """Process-wide renderer, so worker processes and cached charts are shared by all sessions"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer(int(get_setting("chart_render_workers", DEFAULT_WORKERS)))
+        return _renderer
@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from src.groq_client import get_completion
+from src.token_budget import estimate_tokens, truncate_to_tokens
+
+# Summaries are produced off the request path by a small shared pool
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+HISTORY_TOKEN_BUDGET = 600
+SUMMARY_TOKEN_BUDGET = 200
+# Largest slice of evicted turns folded into the summary per completion
+SUMMARY_INPUT_BUDGET = 2500
+MIN_RECENT_MESSAGES = 4
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{turn['role'].title()}: {turn['content']}" for turn in turns)
+
+
+class ConversationMemory:
+    """Multi-turn chat memory bounded by a token budget.
+
+    Recent messages are kept verbatim. Once they outgrow the budget, the
+    oldest ones are folded into a running summary by a background
+    completion, so rendering the history never waits on the LLM.
+    """
+
+    def __init__(self, max_tokens: int = HISTORY_TOKEN_BUDGET, summary_tokens: int = SUMMARY_TOKEN_BUDGET,
+                 min_recent: int = MIN_RECENT_MESSAGES):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.min_recent = min_recent
+        self.summary = ""
+        self.recent: List[Dict[str, str]] = []
+        # Turns evicted from recent that the summary does not cover yet
+        self.pending: List[Dict[str, str]] = []
+        self._summarizing = False
+        # Bumped by clear(), so a summary in flight for the old conversation is discarded
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def add(self, role: str, content: str) -> None:
+        with self._lock:
+            self.recent.append({"role": role, "content": content})
+            while len(self.recent) > self.min_recent and self._recent_tokens() > self._recent_budget():
+                self.pending.append(self.recent.pop(0))
+            start = bool(self.pending) and not self._summarizing
+            if start:
+                self._summarizing = True
+        if start:
+            _summary_executor.submit(self._summarize)
+
+    def _recent_budget(self) -> int:
+        return self.max_tokens - self.summary_tokens
+
+    def _recent_tokens(self) -> int:
+        return sum(estimate_tokens(turn["content"]) for turn in self.recent)
+
+    def _summarize(self) -> None:
+        while True:
+            with self._lock:
+                summary = self.summary
+                generation = self._generation
+                if not self.pending:
+                    self._summarizing = False
+                    return
+                turns, used = [], 0
+                for turn in self.pending:
+                    if turns and used + estimate_tokens(turn["content"]) > SUMMARY_INPUT_BUDGET:
+                        break
+                    turns.append(turn)
+                    used += estimate_tokens(turn["content"])
+
+            new_messages = truncate_to_tokens(format_turns(turns), SUMMARY_INPUT_BUDGET)
+
+            prompt = f"""
+            Update the running summary of a conversation about a company's financials.
+            Keep every figure, company name and open question; drop pleasantries.
+            Answer with the updated summary only, in at most {self.summary_tokens * 3 // 4} words.
+
+            Current summary:
+            {summary or "(empty)"}
+
+            New messages:
+            {new_messages}
+            """
+            try:
+                new_summary = truncate_to_tokens(get_completion(prompt).strip(), self.summary_tokens)
+            except Exception:
+                # Fall back to plain truncation so the history stays bounded
+                new_summary = truncate_to_tokens(f"{summary}\n{new_messages}".strip(), self.summary_tokens, keep_end=True)
+
+            with self._lock:
+                if self._generation != generation:
+                    continue
+                self.summary = new_summary
+                del self.pending[:len(turns)]
+
+    def render(self) -> str:
+        """Conversation history for the prompt, always within max_tokens"""
+        with self._lock:
+            parts = []
+            summary = self.summary
+            if self.pending:
+                # Summary still in flight: include a truncated copy of the evicted turns
+                summary = f"{summary}\n{format_turns(self.pending)}".strip()
+            if summary:
+                parts.append(f"Summary of earlier conversation:\n{truncate_to_tokens(summary, self.summary_tokens, keep_end=True)}")
+            if self.recent:
+                recent = format_turns(self.recent)
+                parts.append(f"Recent messages:\n{truncate_to_tokens(recent, self._recent_budget(), keep_end=True)}")
+        return "\n\n".join(parts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self.recent = []
+            self.pending = []
@@ -0,0 +1,105 @@
+import hashlib
+import mmap
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+IDS_FILE = "ids.npy"
+
+
+def text_id(text: str) -> int:
+    """Stable 63-bit chunk ID derived from the chunk text, so identical chunks share an ID"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') & (2 ** 63 - 1)
+
+
+class ChunkStore:
+    """Read-only, offset-indexed chunk text file.
+
+    Texts are stored back to back as UTF-8 in texts.bin, and offsets.npy
+    holds the n + 1 byte offsets delimiting them. Both files are memory
+    mapped, so opening a store is O(1) and only chunks that are actually
+    read are paged in from disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.offsets = np.load(self.path / OFFSETS_FILE, mmap_mode='r')
+        # Sorted chunk IDs aligned with the texts; positional IDs when absent
+        self.ids = np.load(self.path / IDS_FILE, mmap_mode='r') if (self.path / IDS_FILE).exists() else None
+        self._file = open(self.path / TEXTS_FILE, 'rb')
+        # mmap refuses empty files
+        size = int(self.offsets[-1]) if len(self.offsets) else 0
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @staticmethod
+    def write(path: str, texts: Iterable[str], ids: Optional[Sequence[int]] = None) -> None:
+        """Write a store, replacing files atomically so open readers keep their old mapping.
+
+        ``ids`` must be sorted ascending and aligned with ``texts``.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        offsets = [0]
+        with open(path / f"{TEXTS_FILE}.tmp", 'wb') as f:
+            for text in texts:
+                data = text.encode('utf-8')
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        with open(path / f"{OFFSETS_FILE}.tmp", 'wb') as f:
+            np.save(f, np.array(offsets, dtype='int64'))
+        if ids is not None:
+            with open(path / f"{IDS_FILE}.tmp", 'wb') as f:
+                np.save(f, np.asarray(ids, dtype='int64'))
+            os.replace(path / f"{IDS_FILE}.tmp", path / IDS_FILE)
+        elif (path / IDS_FILE).exists():
+            os.remove(path / IDS_FILE)
+        os.replace(path / f"{TEXTS_FILE}.tmp", path / TEXTS_FILE)
+        os.replace(path / f"{OFFSETS_FILE}.tmp", path / OFFSETS_FILE)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return (Path(path) / OFFSETS_FILE).exists() and (Path(path) / TEXTS_FILE).exists()
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Chunk {i} out of range")
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._data[start:end].decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_many(self, ids: Sequence[int]) -> List[str]:
+        return [self.get_by_id(int(i)) for i in ids]
+
+    def position(self, chunk_id: int) -> int:
+        """Position of a chunk ID, found by binary search over the mapped ID table"""
+        if self.ids is None:
+            return chunk_id
+        pos = int(np.searchsorted(self.ids, chunk_id))
+        if pos >= len(self.ids) or int(self.ids[pos]) != chunk_id:
+            raise KeyError(chunk_id)
+        return pos
+
+    def get_by_id(self, chunk_id: int) -> str:
+        return self[self.position(chunk_id)]
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        for i, text in enumerate(self):
+            yield (int(self.ids[i]) if self.ids is not None else i), text
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
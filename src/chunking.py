@@ -0,0 +1,105 @@
+import re
+from typing import Dict, List, Tuple
+
+# "Item 1A. Risk Factors", "ITEM 7 - Management's Discussion and Analysis"
+ITEM_HEADING = re.compile(r"^\s*item\s+(\d{1,2}[a-c]?)\s*[.:\-–—]?\s*(.{0,120}?)\s*$", re.IGNORECASE)
+# Table of contents lines end with a page number, optionally after dot leaders
+TOC_LINE = re.compile(r"(\.{2,}|\s)\s*\d{1,3}\s*$")
+# Short upper-case lines such as "RISK MANAGEMENT" in non-10-K annual reports
+CAPS_HEADING = re.compile(r"^[A-Z][A-Z&,'\- ]{3,80}$")
+
+MIN_SECTION_WORDS = 200
+DEFAULT_OVERLAP = 50
+
+SectionMap = Dict[str, Dict]
+
+
+def find_headings(lines: List[str]) -> List[Tuple[int, str, str]]:
+    """Return (line number, section key, title) for 10-K items, falling back to caps headings"""
+    items = []
+    for lineno, line in enumerate(lines):
+        match = ITEM_HEADING.match(line)
+        if match and not TOC_LINE.search(line):
+            items.append((lineno, f"Item {match.group(1).upper()}", match.group(2).strip(" .")))
+    if items:
+        return items
+
+    headings = []
+    for lineno, line in enumerate(lines):
+        stripped = line.strip()
+        if CAPS_HEADING.match(stripped) and 1 <= len(stripped.split()) <= 8:
+            headings.append((lineno, stripped.title(), stripped.title()))
+    return headings
+
+
+def split_sections(text: str) -> List[Tuple[str, str, str]]:
+    """Split document text into (section key, title, body) in document order.
+
+    When a section key appears more than once (cross references, running
+    headers), the occurrence with the longest body wins.
+    """
+    lines = text.splitlines()
+    headings = find_headings(lines)
+    if not headings:
+        return [("Document", "Document", text)]
+
+    bounds = [h[0] for h in headings] + [len(lines)]
+    candidates = []
+    for (lineno, key, title), end in zip(headings, bounds[1:]):
+        body = "\n".join(lines[lineno:end])
+        candidates.append((lineno, key, title, body))
+
+    best: Dict[str, Tuple[int, str, str, str]] = {}
+    for candidate in candidates:
+        key = candidate[1]
+        if key not in best or len(candidate[3].split()) > len(best[key][3].split()):
+            best[key] = candidate
+
+    # Sections that lost to a longer duplicate, or are too short, are folded into the preceding one
+    kept = sorted(best.values(), key=lambda c: c[0])
+    kept = [c for c in kept if len(c[3].split()) >= MIN_SECTION_WORDS or c is kept[0]]
+    starts = [c[0] for c in kept]
+    sections = []
+    if starts[0] > 0:
+        sections.append(("Front Matter", "Front Matter", "\n".join(lines[:starts[0]])))
+    for (lineno, key, title, _), end in zip(kept, starts[1:] + [len(lines)]):
+        sections.append((key, title, "\n".join(lines[lineno:end])))
+    return sections
+
+
+def chunk_words(text: str, chunk_size: int, overlap: int = DEFAULT_OVERLAP) -> List[str]:
+    """Split text into chunks of chunk_size words with overlap"""
+    words = text.split()
+    chunks = []
+    current_chunk = []
+
+    for word in words:
+        current_chunk.append(word)
+        if len(current_chunk) >= chunk_size:
+            chunks.append(' '.join(current_chunk))
+            # Keep the last words for context overlap
+            current_chunk = current_chunk[-overlap:]
+
+    # Skip a trailing chunk that is nothing but overlap
+    if current_chunk and (not chunks or len(current_chunk) > overlap):
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+
+def chunk_document(text: str, chunk_size: int = 500, overlap: int = DEFAULT_OVERLAP) -> Tuple[List[str], SectionMap]:
+    """Chunk a filing section by section.
+
+    Returns the chunks and a map of section key -> {"title", "start", "end"}
+    where [start, end) is the section's range of chunk IDs.
+    """
+    chunks: List[str] = []
+    section_map: SectionMap = {}
+    for key, title, body in split_sections(text):
+        section_chunks = chunk_words(body, chunk_size, overlap)
+        if not section_chunks:
+            continue
+        if key in section_map:
+            key = f"{key} ({len(section_map)})"
+        section_map[key] = {"title": title, "start": len(chunks), "end": len(chunks) + len(section_chunks)}
+        chunks.extend(section_chunks)
+    return chunks, section_map
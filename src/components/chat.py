@@ -1,5 +1,14 @@
 import streamlit as st
 from src.groq_client import get_completion
+from src.token_budget import estimate_tokens, fit_to_budget, truncate_to_tokens
+from src.chat_memory import ConversationMemory
+
+# GroqLLM declares a 4096 token window with up to 1024 completion tokens;
+# the rest goes to instructions, the question and this context budget
+CONTEXT_TOKEN_BUDGET = 2500
+# Share of the budget reserved for retrieved document chunks
+RETRIEVAL_BUDGET_SHARE = 0.6
+RETRIEVAL_TOP_K = 8
 
 def format_currency_for_display(text):
     """Replace $ with \$ to prevent LaTeX interpretation"""
@@ -8,6 +17,14 @@ def format_currency_for_display(text):
 def init_chat_state():
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
+
+def reset_chat_state():
+    """Forget the conversation, e.g. when a new document replaces the one it was about"""
+    st.session_state.messages = []
+    if "chat_memory" in st.session_state:
+        st.session_state.chat_memory.clear()
 
 def display_chat_messages():
     for message in st.session_state.messages:
@@ -15,7 +32,7 @@ def display_chat_messages():
             formatted_content = format_currency_for_display(message["content"])
             st.markdown(formatted_content)
 
-def create_chat_prompt(context, question):
+def create_chat_prompt(context, question, history=""):
     return f"""
     Based on the following context, please answer the question.
     Provide a clear, concise, and informative response.
@@ -24,6 +41,9 @@ def create_chat_prompt(context, question):
     Context:
     {context}
     
+    Conversation so far:
+    {history or "(this is the first question)"}
+    
     Question:
     {question}
     
@@ -45,7 +65,31 @@ def format_context(context_data):
         formatted_context = str(context_data).replace("$", "USD ")
     return formatted_context
 
-def chat_interface(context_data):
+def retrieve_chunks(processor, question, max_tokens, k=RETRIEVAL_TOP_K):
+    """Top-k document chunks (or tree summaries, for broad questions) for the question that fit in max_tokens"""
+    chunks = processor.search_tree(question, k)
+    selected, _ = fit_to_budget([chunk.replace("$", "USD ") for chunk in chunks], max_tokens)
+    return selected
+
+def build_context(context_data, question, processor=None, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Format the chat context so it never exceeds token_budget.
+
+    With a document processor, the chunks most relevant to the question are
+    retrieved from its FAISS index instead of sending the whole document.
+    """
+    # Processors released by the memory governor reload on search
+    if processor is None or (processor.index is None and not processor.evicted):
+        return truncate_to_tokens(format_context(context_data), token_budget)
+
+    chunk_budget = int(token_budget * RETRIEVAL_BUDGET_SHARE)
+    chunks = retrieve_chunks(processor, question, chunk_budget)
+    document_context = "\n\n".join(chunks)
+
+    remaining = token_budget - estimate_tokens(document_context)
+    other_context = truncate_to_tokens(format_context(context_data), remaining)
+    return f"{other_context}\nRelevant Document Excerpts:\n{document_context}\n"
+
+def chat_interface(context_data, processor=None, token_budget=CONTEXT_TOKEN_BUDGET):
     init_chat_state()
     
     # Display chat messages
@@ -62,12 +106,22 @@ def chat_interface(context_data):
         # Generate response
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                # Format context with proper currency handling
-                context = format_context(context_data)
+                # History and context share the token budget so the prompt size stays flat
+                memory = st.session_state.chat_memory
+                history = memory.render()
+                context_budget = token_budget - estimate_tokens(history)
+                # Figures the filing's tables report are looked up instead of asking the LLM
+                response = processor.lookup_fact(prompt) if processor is not None else None
+                if response is None:
+                    context = build_context(context_data, prompt, processor, context_budget)
+                    
+                    # Get response from Groq
+                    full_prompt = create_chat_prompt(context, prompt, history)
+                    response = get_completion(full_prompt)
                 
-                # Get response from Groq
-                full_prompt = create_chat_prompt(context, prompt)
-                response = get_completion(full_prompt)
+                # Older turns are summarised in the background
+                memory.add("user", prompt)
+                memory.add("assistant", response)
                 
                 # Format response for display
                 formatted_response = format_currency_for_display(response)
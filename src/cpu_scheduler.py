@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+import faiss
+import numpy as np
+
+# Fewer threads than this per job and matrix kernels stop scaling anyway
+MIN_THREADS_PER_JOB = 2
+# Timings of this many recent jobs are kept for stats()
+JOB_HISTORY = 200
+
+
+def set_thread_budget(threads: int) -> None:
+    """Cap torch intra-op and FAISS OpenMP threads; both settings are process-wide"""
+    faiss.omp_set_num_threads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+@dataclass
+class JobTiming:
+    name: str
+    threads: int
+    queued_seconds: float
+    run_seconds: float = 0.0
+
+
+class CpuScheduler:
+    """Admission control for CPU-heavy document jobs (embedding, index builds).
+
+    At most ``max_jobs`` jobs run at once and later ones wait for a free
+    slot. Since torch and FAISS thread pools are process-wide, the
+    cores are split evenly between job slots and every library is capped at
+    ``threads_per_job``, so concurrent sessions never oversubscribe the pod.
+    An explicit ``threads_per_job`` (the ``embedding_threads`` setting)
+    replaces the even split, so the encoder and the scheduler agree on it.
+    """
+
+    def __init__(self, cores: Optional[int] = None, max_jobs: Optional[int] = None, threads_per_job: Optional[int] = None):
+        self.cores = cores or os.cpu_count() or 1
+        self.max_jobs = max_jobs or max(1, self.cores // MIN_THREADS_PER_JOB)
+        self.threads_per_job = min(threads_per_job or max(1, self.cores // self.max_jobs), self.cores)
+        self._slots = threading.Semaphore(self.max_jobs)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self._history = deque(maxlen=JOB_HISTORY)
+        set_thread_budget(self.threads_per_job)
+
+    @contextmanager
+    def job(self, name: str = "ingest") -> Iterator[JobTiming]:
+        """Run a block as a scheduled job, waiting for a free slot first"""
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        self._slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        # Re-applied per job in case a library reset its thread pool
+        set_thread_budget(self.threads_per_job)
+        timing = JobTiming(name, self.threads_per_job, started - queued)
+        try:
+            yield timing
+        finally:
+            timing.run_seconds = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                self._history.append(timing)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            waits = np.array([t.queued_seconds for t in self._history])
+            runs = np.array([t.run_seconds for t in self._history])
+            return {
+                "cores": self.cores,
+                "max_jobs": self.max_jobs,
+                "threads_per_job": self.threads_per_job,
+                "running": self.running,
+                "waiting": self.waiting,
+                "jobs": len(self._history),
+                "mean_wait_s": float(waits.mean()) if len(waits) else 0.0,
+                "p95_wait_s": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+                "mean_run_s": float(runs.mean()) if len(runs) else 0.0,
+            }
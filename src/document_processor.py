@@ -1,130 +1,440 @@
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pypdf import PdfReader
+from io import BytesIO
 import json
-from src.groq_client import get_completion
+import threading
+from contextlib import contextmanager
+from src.groq_client import get_completion, failed_generation
+from src.answer_parser import parse_answer
+from src.embeddings import get_embedding_model
+from src.index_cache import IndexCache
+from src.embedding_cache import EmbeddingCache, model_key
+from src.vector_index import build_index, index_memory_bytes, search_params
+from src.bm25 import BM25Index, reciprocal_rank_fusion
+from src.chunking import chunk_document
+from src.text_cleaning import strip_boilerplate
+from src.summarizer import load_or_build_summaries, summary_context
+from src.summary_tree import SummaryTree, build_summary_tree
+from src.fact_store import FactStore, format_fact
 import streamlit as st
 
+# Embeddings of canonical questions (e.g. the fixed analyze_report queries),
+# shared by every processor using the same model
+_query_embedding_cache: Dict[Tuple[str, str], np.ndarray] = {}
+_query_embedding_lock = threading.Lock()
+
+# Dense and keyword candidates fetched per result before rank fusion
+HYBRID_CANDIDATE_FACTOR = 4
+# Bump when chunking changes so cached indexes are rebuilt
+CHUNKER_VERSION = 4
+# Rough per-posting cost of the BM25 index (tuple plus list slot)
+BM25_POSTING_BYTES = 80
+# Groq JSON mode; answers are validated against DocumentAnswer
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
 class DocumentProcessor:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', chunk_size: int = 500):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', chunk_size: int = 500, cache: Optional[IndexCache] = None, index_backend: str = "auto", hybrid: bool = True, compression: Optional[str] = None, clean_text: bool = True,
+                 embedding_cache: Optional[EmbeddingCache] = None, use_tree: bool = False):
+        self.model = get_embedding_model(model_name)
+        self.model_name = model_name
         self.chunk_size = chunk_size
+        self.index_backend = index_backend
+        # None keeps exact float32 vectors; "fp16", "sq8" or "pq" compress them
+        self.compression = compression
+        # Strip running headers / footers, page numbers and contents lines before chunking
+        self.clean_text = clean_text
+        self.cleaning_stats = {}
+        self.cache = cache if cache is not None else IndexCache()
+        self.cache_key = None
+        # Chunks shared with previously ingested filings reuse their stored embeddings
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        self.embedding_stats = {}
+        self.from_cache = False
+        self.hybrid = hybrid
         self.index = None
+        self.bm25 = None
         self.chunks = []
+        # Section key -> {"title", "start", "end"} chunk ranges
+        self.sections = {}
+        # Line item / period / value facts parsed from the filing's financial tables
+        self.facts = FactStore()
+        # Map-reduce section summaries covering the whole document; empty unless summarize() ran
+        self.summaries = []
+        # Cluster summaries stacked above the chunks in the same index; None unless build_tree() ran,
+        # or use_tree is set and the cached index has one
+        self.use_tree = use_tree
+        self.tree = None
+        # Cached tree kept as stored while unused, so saving the index again does not drop it
+        self._tree_data = None
+        # Set by IndexRegistry, which may release the index while the session is idle
+        self.registry = None
+        self.session_id = None
+        self.evicted = False
+        self._resident_bytes = 0
+        self._resident_lock = threading.RLock()
 
     def process_pdf(self, pdf_file) -> List[str]:
-        """Extract text from PDF and split into chunks"""
+        """Extract text from PDF and split into chunks, reusing a cached index when available"""
         try:
-            reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            
-            # Split into smaller chunks with overlap
-            words = text.split()
-            chunks = []
-            current_chunk = []
-            word_count = 0
-            
-            for word in words:
-                current_chunk.append(word)
-                word_count += 1
-                
-                if word_count >= self.chunk_size:
-                    chunks.append(' '.join(current_chunk))
-                    # Keep last 50 words for context overlap
-                    current_chunk = current_chunk[-50:]
-                    word_count = len(current_chunk)
+            data = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+            self.cache_key = IndexCache.make_key(data, model_key(self.model, self.model_name), self.chunk_size, self.index_backend, self.compression, self.clean_text, CHUNKER_VERSION)
+
+            cached = self.cache.load(self.cache_key)
+            if cached is not None:
+                self._restore(cached)
+                self.from_cache = True
+                return self.chunks
+
+            reader = PdfReader(BytesIO(data))
+            pages = [page.extract_text() for page in reader.pages]
+            # Before cleaning, which drops table rows repeated across pages
+            self.facts = FactStore.from_pages(pages)
+            if self.clean_text:
+                pages, self.cleaning_stats = strip_boilerplate(pages)
+            text = "\n".join(pages) + "\n"
             
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
+            # Split into chunks along the filing's item / heading structure
+            chunks, self.sections = chunk_document(text, self.chunk_size)
                 
             self.chunks = chunks
+            self.build_keyword_index()
             return chunks
         except Exception as e:
             st.error(f"Error processing PDF: {str(e)}")
             return []
 
+    def build_keyword_index(self):
+        """Build the BM25 inverted index used alongside the FAISS index"""
+        self.bm25 = BM25Index(self.chunks) if self.hybrid else None
+
     def create_index(self):
         """Create FAISS index from chunks"""
         try:
+            if self.from_cache and self.index is not None:
+                return True
+
             if not self.chunks:
                 raise ValueError("No chunks available to create index")
                 
-            embeddings = self.model.encode(self.chunks)
-            dimension = embeddings.shape[1]
-            
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(np.array(embeddings).astype('float32'))
+            embeddings, self.embedding_stats = self.embedding_cache.encode(self.model, self.model_name, self.chunks)
+            self.index = build_index(embeddings, self.index_backend, self.compression)
+
+            if self.cache_key:
+                try:
+                    self.cache.save(self.cache_key, self.index, self.chunks, self._cache_metadata())
+                except OSError as e:
+                    st.warning(f"Could not cache document index: {str(e)}")
+            self._update_resident_bytes()
             return True
         except Exception as e:
             st.error(f"Error creating index: {str(e)}")
             return False
 
-    def search(self, query: str, k: int = 3) -> List[str]:
-        """Search for relevant chunks"""
-        if not self.index:
-            raise ValueError("Index not created. Please process document first.")
-            
-        query_vector = self.model.encode([query])
-        distances, indices = self.index.search(np.array(query_vector).astype('float32'), k)
-        
-        return [self.chunks[i] for i in indices[0]]
+    def _cache_metadata(self) -> Dict:
+        metadata = {"sections": self.sections, "facts": self.facts.to_records()}
+        tree_data = self.tree.to_dict() if self.tree is not None else self._tree_data
+        if tree_data is not None:
+            metadata["tree"] = tree_data
+        return metadata
 
-    def query(self, question: str) -> str:
-        """Query the document with a question"""
+    def _restore(self, cached):
+        """Adopt an (index, chunks, metadata) entry loaded from the index cache"""
+        self.index, self.chunks, metadata = cached
+        self.sections = metadata.get("sections", {})
+        self.facts = FactStore.from_records(metadata.get("facts", []))
+        self._tree_data = metadata.get("tree")
+        self.tree = SummaryTree.from_dict(self._tree_data) if self.use_tree and self._tree_data else None
+        self.build_keyword_index()
+        self._update_resident_bytes()
+
+    def _update_resident_bytes(self):
+        index_bytes = index_memory_bytes(self.index) if self.index is not None else 0
+        chunk_bytes = sum(len(chunk) for chunk in self.chunks)
+        bm25_bytes = sum(len(p) for p in self.bm25.postings.values()) * BM25_POSTING_BYTES if self.bm25 else 0
+        self._resident_bytes = index_bytes + chunk_bytes + bm25_bytes
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by the index, chunk texts and keyword index"""
+        return 0 if self.evicted else self._resident_bytes
+
+    def release(self) -> bool:
+        """Drop the document from memory, keeping it in the on-disk cache.
+
+        Returns False without waiting when the processor is busy searching.
+        """
+        if not self._resident_lock.acquire(blocking=False):
+            return False
         try:
-            relevant_chunks = self.search(question)
-            context = "\n".join(relevant_chunks)
-            
-            prompt = f"""
-            Based on the following context from an annual report, please answer the question.
-            Structure your response in the following format:
+            if self.evicted or self.index is None or not self.cache_key:
+                return False
+            # The cache is size-bounded too, so the entry may have been evicted since
+            if not self.cache.contains(self.cache_key):
+                self.cache.save(self.cache_key, self.index, self.chunks, self._cache_metadata())
+            self.index = None
+            self.chunks = []
+            self.bm25 = None
+            self.evicted = True
+            return True
+        except OSError:
+            return False
+        finally:
+            self._resident_lock.release()
 
-            1. Key Findings:
-            - Main point 1
-            - Main point 2
-            - Main point 3
+    @contextmanager
+    def loaded(self):
+        """Keep the document in memory for the block, reloading it first if it was released.
 
-            2. Detailed Analysis:
-            [Provide a detailed analysis broken down into clear paragraphs]
+        The memory governor cannot release it until the block exits, so chunks
+        and sections can be read safely inside.
+        """
+        with self._resident_lock:
+            self._reload_if_evicted()
+            yield self
+        if self.registry is not None:
+            self.registry.touch(self.session_id)
 
-            3. Summary:
-            [A brief conclusion of the findings]
+    def _reload_if_evicted(self):
+        if not self.evicted:
+            return
+        cached = self.cache.load(self.cache_key)
+        if cached is None:
+            raise ValueError("Document is no longer cached. Please process the document again.")
+        self._restore(cached)
+        self.evicted = False
 
-            Context:
-            {context}
+    def encode_queries(self, queries: List[str], cache: bool = False) -> np.ndarray:
+        """Encode queries in a single forward pass, optionally caching their embeddings"""
+        if not cache:
+            return np.array(self.model.encode(queries)).astype('float32')
 
-            Question:
-            {question}
+        key = model_key(self.model, self.model_name)
+        with _query_embedding_lock:
+            missing = [q for q in dict.fromkeys(queries) if (key, q) not in _query_embedding_cache]
+        if missing:
+            vectors = np.array(self.model.encode(missing)).astype('float32')
+            with _query_embedding_lock:
+                for q, vector in zip(missing, vectors):
+                    _query_embedding_cache[(key, q)] = vector
+        return np.vstack([_query_embedding_cache[(key, q)] for q in queries])
 
-            Remember to:
-            - Use clear, concise language
-            - Break down complex information into digestible points
-            - Provide specific examples or data when available
-            - Maintain a professional tone
-            """
-            
-            response = get_completion(prompt)
-            
-            # Format the response for better display
-            formatted_response = {
-                "structured_analysis": {
-                    "key_findings": response.split("1. Key Findings:")[1].split("2. Detailed Analysis:")[0].strip(),
-                    "detailed_analysis": response.split("2. Detailed Analysis:")[1].split("3. Summary:")[0].strip(),
-                    "summary": response.split("3. Summary:")[1].strip()
-                }
+    def resolve_sections(self, names: Optional[List[str]]) -> Optional[List[Tuple[int, int]]]:
+        """Chunk ID ranges of the sections matching names.
+
+        A name matches a section key ("Item 1A") exactly or appears in its
+        title ("risk"). Returns None, meaning the whole document, when
+        nothing matches.
+        """
+        ranges = [(self.sections[key]["start"], self.sections[key]["end"]) for key in self.matching_sections(names)]
+        return ranges or None
+
+    def matching_sections(self, names: Optional[List[str]]) -> List[str]:
+        """Keys of the sections whose key or title matches any of names"""
+        keys = []
+        for key, section in self.sections.items():
+            if any(name.lower() == key.lower() or name.lower() in section["title"].lower() for name in names or ()):
+                keys.append(key)
+        return keys
+
+    def search(self, query: str, k: int = 3, sections: Optional[List[str]] = None) -> List[str]:
+        """Search for relevant chunks, optionally only within the named sections"""
+        return self.search_batch([query], k, sections=[sections])[0]
+
+    def search_batch(self, queries: List[str], k: int = 3, cache_embeddings: bool = False,
+                     sections: Optional[List[Optional[List[str]]]] = None) -> List[List[str]]:
+        """Search for relevant chunks for several queries with one multi-query FAISS search"""
+        with self._resident_lock:
+            ids = self.search_batch_ids(queries, k, cache_embeddings, sections)
+            return [[self.chunks[i] for i in row] for row in ids]
+
+    def search_batch_ids(self, queries: List[str], k: int = 3, cache_embeddings: bool = False,
+                         sections: Optional[List[Optional[List[str]]]] = None) -> List[List[int]]:
+        """Chunk IDs for several queries, fusing dense and BM25 rankings when hybrid search is on.
+
+        ``sections`` optionally gives, per query, the section names to search
+        in. Queries sharing the same restriction run as one FAISS search.
+        """
+        with self._resident_lock:
+            self._reload_if_evicted()
+            if not self.index:
+                raise ValueError("Index not created. Please process document first.")
+            results = self._search_batch_ids(queries, k, cache_embeddings, sections)
+        if self.registry is not None:
+            self.registry.touch(self.session_id)
+        return results
+
+    def _search_batch_ids(self, queries: List[str], k: int, cache_embeddings: bool,
+                          sections: Optional[List[Optional[List[str]]]]) -> List[List[int]]:
+        query_vectors = self.encode_queries(queries, cache=cache_embeddings)
+        sections = sections or [None] * len(queries)
+
+        groups: Dict[Optional[Tuple[Tuple[int, int], ...]], List[int]] = {}
+        for position, names in enumerate(sections):
+            ranges = self.resolve_sections(names)
+            groups.setdefault(tuple(ranges) if ranges else None, []).append(position)
+
+        results: List[List[int]] = [[] for _ in queries]
+        for ranges, positions in groups.items():
+            for position, ids in zip(positions, self._search_vectors(
+                    [queries[p] for p in positions], query_vectors[positions], k, ranges)):
+                results[position] = ids
+        return results
+
+    def _search_vectors(self, queries: List[str], query_vectors: np.ndarray, k: int,
+                        ranges: Optional[Tuple[Tuple[int, int], ...]] = None) -> List[List[int]]:
+        # Over-fetch candidates so reciprocal rank fusion has something to re-rank
+        n_candidates = max(k * HYBRID_CANDIDATE_FACTOR, k) if self.bm25 else k
+
+        params = None
+        allowed = None
+        if ranges:
+            allowed = np.concatenate([np.arange(start, end, dtype='int64') for start, end in ranges])
+            selector = faiss.IDSelectorRange(*ranges[0]) if len(ranges) == 1 else faiss.IDSelectorBatch(allowed)
+            params = search_params(self.index, selector)
+        elif self.index.ntotal > len(self.chunks):
+            # Summary tree nodes follow the chunks in the index
+            params = search_params(self.index, faiss.IDSelectorRange(0, len(self.chunks)))
+        distances, indices = self.index.search(query_vectors, n_candidates, params=params)
+
+        results = []
+        for query, row in zip(queries, indices):
+            # Approximate indexes pad with -1 when fewer than k neighbours are found
+            dense_ids = [int(i) for i in row if i >= 0]
+            if self.bm25:
+                keyword_ids = [doc_id for doc_id, _ in self.bm25.search(query, n_candidates, allowed)]
+                dense_ids = reciprocal_rank_fusion([dense_ids, keyword_ids])
+            results.append(dense_ids[:k])
+        return results
+
+    def summarize(self, max_workers: int = 4, progress=None) -> List[Dict]:
+        """Summarise every section once (cached with the index) so answers can cover the whole document"""
+        with self._resident_lock:
+            self._reload_if_evicted()
+            self.summaries = load_or_build_summaries(self, max_workers, progress)
+        return self.summaries
+
+    def with_summaries(self, relevant_chunks: List[str], sections: Optional[List[str]] = None) -> List[str]:
+        """Prefix retrieved chunks with section summaries, those matching sections first"""
+        if not self.summaries:
+            return relevant_chunks
+        return summary_context(self.summaries, self.matching_sections(sections)) + relevant_chunks
+
+    def build_tree(self, max_workers: int = 4, progress=None) -> SummaryTree:
+        """Build the hierarchical summary tree on top of the chunk index and cache it with the index"""
+        with self._resident_lock:
+            self.use_tree = True
+            self._reload_if_evicted()
+            if self.tree is None and self._tree_data is not None:
+                # Built by an earlier session that ran without the tree in use
+                self.tree = SummaryTree.from_dict(self._tree_data)
+            if self.tree is None:
+                # Chunk embeddings come straight from the embedding cache filled by create_index
+                embeddings, _ = self.embedding_cache.encode(self.model, self.model_name, self.chunks)
+                self.tree = build_summary_tree(self, embeddings, max_workers, progress)
+                if self.cache_key:
+                    self.cache.save(self.cache_key, self.index, self.chunks, self._cache_metadata())
+                self._update_resident_bytes()
+        return self.tree
+
+    def search_tree(self, query: str, k: int = 3) -> List[str]:
+        """Route a query to the best tree level.
+
+        Detailed questions land on the chunks and use normal hybrid search;
+        broad ones get the best matching summary followed by the best chunks
+        beneath it, so the prompt holds k texts either way.
+        """
+        if not self.use_tree or self.tree is None:
+            return self.search(query, k)
+        with self._resident_lock:
+            self._reload_if_evicted()
+            query_vector = self.encode_queries([query])[0]
+            level = self.tree.route(self.index, query_vector)
+            if level == 0:
+                return self.search(query, k)
+            node_id = self.tree.search(self.index, query_vector, 1, level)[0]
+            chunk_ids = self.tree.drill_down(self.index, query_vector, node_id, k - 1) if k > 1 else []
+            return [self.tree.text(node_id, self.chunks)] + [self.chunks[i] for i in chunk_ids]
+
+    @staticmethod
+    def error_response(error: Exception) -> Dict:
+        return {
+            "structured_analysis": {
+                "error": "Unable to process query at this time.",
+                "details": str(error)
             }
-            
-            return formatted_response
-            
+        }
+
+    def lookup_fact(self, question: str) -> Optional[str]:
+        """Answer a numeric question like "R&D expense in 2022" from the fact store, if it covers it"""
+        fact = self.facts.answer(question)
+        return format_fact(fact) if fact else None
+
+    @staticmethod
+    def fact_response(answer: str) -> Dict:
+        return {
+            "structured_analysis": {
+                "key_findings": f"- {answer}",
+                "detailed_analysis": "Read directly from the financial tables in the filing.",
+                "summary": answer
+            }
+        }
+
+    def query(self, question: str) -> str:
+        """Query the document with a question"""
+        try:
+            fact = self.lookup_fact(question)
+            if fact:
+                return self.fact_response(fact)
+            return self.generate_answer(question, self.with_summaries(self.search_tree(question)))
         except Exception as e:
             st.error(f"Error querying document: {str(e)}")
-            return {
-                "structured_analysis": {
-                    "error": "Unable to process query at this time.",
-                    "details": str(e)
-                }
-            } 
\ No newline at end of file
+            return self.error_response(e)
+
+    def generate_answer(self, question: str, relevant_chunks: List[str]) -> Dict:
+        """Answer a question from retrieved chunks, raising only if the completion itself fails.
+
+        Safe to call from worker threads since it never touches Streamlit.
+        """
+        context = "\n".join(relevant_chunks)
+        
+        prompt = f"""
+        Based on the following context from an annual report, please answer the question.
+        Respond with a single JSON object and nothing else, using exactly these keys:
+
+        {{
+            "key_findings": ["Main point 1", "Main point 2", "Main point 3"],
+            "detailed_analysis": "A detailed analysis broken down into clear paragraphs",
+            "summary": "A brief conclusion of the findings"
+        }}
+
+        Context:
+        {context}
+
+        Question:
+        {question}
+
+        Remember to:
+        - Use clear, concise language
+        - Break down complex information into digestible points
+        - Provide specific examples or data when available
+        - Maintain a professional tone
+        """
+        
+        try:
+            response = get_completion(prompt, response_format=JSON_RESPONSE_FORMAT)
+        except Exception as e:
+            # Groq rejects JSON-mode output that fails to parse, but returns the text for repair
+            response = failed_generation(e)
+            if response is None:
+                raise
+        
+        # Malformed JSON is repaired locally instead of discarding the completion
+        answer, _ = parse_answer(response)
+        return {
+            "structured_analysis": {
+                "key_findings": "\n".join(f"- {point}" for point in answer.key_findings),
+                "detailed_analysis": answer.detailed_analysis,
+                "summary": answer.summary
+            }
+        }
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.chunk_store import text_id
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "embedding_cache.sqlite"
+# About 300 MB of 384-dimensional float32 vectors
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+def model_key(model, model_name: str) -> str:
+    """Cache key for an encoder's vectors; torch, onnx and onnx-int8 give different vectors"""
+    backend = getattr(model, "backend", "torch")
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+class EmbeddingCache:
+    """Persistent chunk-hash -> embedding cache shared across documents.
+
+    Consecutive filings of the same company repeat whole passages (risk
+    factors, accounting policies), so only text not seen before under the
+    same model is sent to the encoder. Least recently used vectors are
+    pruned once the cache holds more than ``max_entries``.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so read-only users of a VectorDB never touch the file
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, hash INTEGER NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        return self._conn
+
+    def get_many(self, model_name: str, hashes: List[int]) -> Dict[int, np.ndarray]:
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model_name, *batch],
+                ).fetchall()
+                found.update((h, np.frombuffer(v, dtype='float32')) for h, v in rows)
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                                 [(now, model_name, h) for h in found])
+                conn.commit()
+        return found
+
+    def put_many(self, model_name: str, vectors: Dict[int, np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model_name, h, np.asarray(v, dtype='float32').tobytes(), now) for h, v in vectors.items()],
+            )
+            self._prune(conn)
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM embeddings WHERE rowid IN "
+                         "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+
+    def encode(self, model, model_name: str, texts: List[str]) -> Tuple[np.ndarray, Dict[str, float]]:
+        """Embed texts, encoding only those missing from the cache.
+
+        Returns the embeddings in input order and the ingest's hit statistics.
+        """
+        model_name = model_key(model, model_name)
+        hashes = [text_id(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        cached = self.get_many(model_name, list(unique))
+        missing = [h for h in unique if h not in cached]
+
+        if missing:
+            encoded = np.array(model.encode([unique[h] for h in missing])).astype('float32')
+            new_vectors = dict(zip(missing, encoded))
+            self.put_many(model_name, new_vectors)
+            cached.update(new_vectors)
+
+        missing_set = set(missing)
+        hits = sum(h not in missing_set for h in hashes)
+        stats = {
+            "chunks": len(texts),
+            "cache_hits": hits,
+            "embedded": len(missing),
+            "hit_rate": hits / len(texts) if texts else 0.0,
+        }
+        embeddings = np.vstack([cached[h] for h in hashes]) if texts else np.zeros((0, 0), dtype='float32')
+        return embeddings, stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
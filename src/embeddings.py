@@ -0,0 +1,91 @@
+import threading
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from src.settings import get_setting
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+# "torch" is the reference implementation; the ONNX graphs run the same weights
+# through onnxruntime, "onnx-int8" with dynamically quantised int8 matmuls
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+DEFAULT_BATCH_SIZE = 32
+# Quantised graph shipped in the sentence-transformers model repos; AVX2 runs on any x86-64 pod
+DEFAULT_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+class Encoder:
+    """SentenceTransformer with a selectable CPU backend and tuned batching.
+
+    Exposes the ``encode`` / ``get_sentence_embedding_dimension`` interface
+    the rest of the code expects from a SentenceTransformer.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, backend: str = DEFAULT_BACKEND,
+                 batch_size: int = DEFAULT_BATCH_SIZE, threads: Optional[int] = None, int8_file: str = DEFAULT_INT8_FILE):
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend {backend!r}, expected one of {ENCODER_BACKENDS}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self.backend = backend
+        try:
+            self.model = self._load(backend, int8_file)
+        except Exception as e:
+            # ONNX needs sentence-transformers >= 3.2 with optimum[onnxruntime]
+            warnings.warn(f"Could not load {backend} encoder ({e}); falling back to torch")
+            self.backend = "torch"
+            self.model = self._load("torch", int8_file)
+
+    def _load(self, backend: str, int8_file: str) -> SentenceTransformer:
+        if backend == "torch":
+            if self.threads:
+                import torch
+                torch.set_num_threads(self.threads)
+            return SentenceTransformer(self.model_name)
+
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if backend == "onnx-int8":
+            model_kwargs["file_name"] = int8_file
+        if self.threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+
+    def encode(self, sentences: List[str], **kwargs) -> np.ndarray:
+        kwargs.setdefault("batch_size", self.batch_size)
+        return self.model.encode(sentences, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+_models: Dict[Tuple[str, str], Encoder] = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str = DEFAULT_MODEL, backend: Optional[str] = None) -> Encoder:
+    """Process-wide encoder, loaded once per model name and backend.
+
+    The backend, batch size and thread count default to the
+    ``embedding_backend``, ``embedding_batch_size`` and ``embedding_threads``
+    secrets.
+    """
+    backend = backend or get_setting("embedding_backend", DEFAULT_BACKEND)
+    with _models_lock:
+        model = _models.get((model_name, backend))
+        if model is None:
+            threads = get_setting("embedding_threads", None)
+            model = _models[(model_name, backend)] = Encoder(
+                model_name,
+                backend,
+                batch_size=int(get_setting("embedding_batch_size", DEFAULT_BATCH_SIZE)),
+                threads=int(threads) if threads else None,
+            )
+        return model
@@ -0,0 +1,270 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+# A period header holds two or more fiscal years: "2022 2021 2020", "September 24, 2022 September 25, 2021"
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+# Trailing numeric cells: "394,328", "(1,234)", "$ 26.3", "—"
+NUMBER_CELL = re.compile(r"(?:\$\s*)?(\(?-?\d[\d,]*(?:\.\d+)?\)?|[—–-])\s*%?$")
+UNIT = re.compile(r"in\s+(thousands|millions|billions)", re.IGNORECASE)
+UNIT_SCALE = {"thousands": 1e3, "millions": 1e6, "billions": 1e9}
+# Lines of prose after which a table's period header no longer applies
+MAX_GAP_LINES = 6
+MAX_HEADER_WORDS = 10
+# Small decimal amounts in a table stated in millions are per-share figures
+PER_SHARE_MAX = 1000
+
+# Common abbreviations in questions -> line item wording in filings
+ALIASES = {
+    "r&d": "research and development",
+    "sg&a": "selling general and administrative",
+    "revenue": "net sales",
+    "revenues": "net sales",
+    "sales": "net sales",
+    "capex": "payments for acquisition of property plant and equipment",
+    "eps": "earnings per share",
+    "tax": "provision for income taxes",
+}
+# Questions asking for a reported figure; "what is/are" also needs a year ("What is R&D?" is not numeric)
+NUMERIC_QUESTION = re.compile(r"^\s*(?:how\s+(?:much|many)|what\s+(?:was|were))\b", re.IGNORECASE)
+QUESTION_STOPWORDS = frozenset(
+    "what was were is the of in for fy fiscal year how much did total company report reported amount value expense expenses".split()
+)
+
+# Alpha Vantage fundamentals field -> line item names used by filers
+ALPHA_VANTAGE_LINE_ITEMS = {
+    "totalRevenue": ["total net sales", "net sales", "total revenues", "total revenue", "revenues", "revenue"],
+    "grossProfit": ["gross margin", "total gross margin", "gross profit"],
+    "researchAndDevelopment": ["research and development"],
+    "sellingGeneralAndAdministrative": ["selling general and administrative"],
+    "operatingIncome": ["operating income", "income from operations"],
+    "incomeTaxExpense": ["provision for income taxes", "income tax expense"],
+    "netIncome": ["net income"],
+    "totalAssets": ["total assets"],
+    "totalLiabilities": ["total liabilities"],
+    "totalShareholderEquity": ["total shareholders equity", "total stockholders equity"],
+    "operatingCashflow": ["cash generated by operating activities", "net cash provided by operating activities"],
+}
+ALPHA_VANTAGE_FUNCTIONS = ("INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW")
+RECONCILE_TOLERANCE = 0.01
+
+FACT_COLUMNS = ["line_item", "label", "period", "value", "scale", "page"]
+
+
+def normalize_label(label: str) -> str:
+    label = label.lower().replace("&", " and ")
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", label).split())
+
+
+def parse_number(cell: str) -> Optional[float]:
+    cell = cell.strip()
+    if cell in ("—", "–", "-"):
+        return 0.0
+    negative = cell.startswith("(") and cell.endswith(")")
+    try:
+        value = float(cell.strip("()").replace(",", ""))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def split_row(line: str, n_values: int) -> Optional[Tuple[str, List[float], bool]]:
+    """Split a table row into its label, exactly n_values trailing numbers and whether all are decimals"""
+    rest = line.rstrip()
+    values = []
+    decimals = True
+    while len(values) < n_values:
+        match = NUMBER_CELL.search(rest)
+        if not match:
+            return None
+        value = parse_number(match.group(1))
+        if value is None:
+            return None
+        values.append(value)
+        decimals = decimals and "." in match.group(1)
+        rest = rest[:match.start()].rstrip()
+    label = rest.rstrip(" $:.")
+    # A row needs a textual label, and must not carry further numbers (e.g. a change column)
+    if not re.search(r"[A-Za-z]{3}", label) or NUMBER_CELL.search(label):
+        return None
+    return label, values[::-1], decimals
+
+
+def period_header(line: str) -> Optional[List[int]]:
+    years = [int(y) for y in YEAR.findall(line)]
+    other_words = [w for w in YEAR.sub(" ", line).split() if re.search(r"[A-Za-z]", w)]
+    if len(years) >= 2 and len(set(years)) == len(years) and len(other_words) <= MAX_HEADER_WORDS:
+        return years
+    return None
+
+
+def extract_facts(pages: List[str]) -> pd.DataFrame:
+    """Parse (line item, period, value) facts from the tables in extracted page text"""
+    rows = []
+    for page_number, page in enumerate(pages, start=1):
+        periods: Optional[List[int]] = None
+        scale = 1.0
+        gap = 0
+        for line in page.splitlines():
+            unit = UNIT.search(line)
+            if unit:
+                scale = UNIT_SCALE[unit.group(1).lower()]
+            header = period_header(line)
+            if header:
+                periods, gap = header, 0
+                continue
+            if periods is None:
+                continue
+            row = split_row(line, len(periods))
+            if row is None:
+                gap += 1
+                if gap > MAX_GAP_LINES:
+                    periods, scale = None, 1.0
+                continue
+            gap = 0
+            label, values, decimals = row
+            # Per-share amounts and percentages are not scaled by the table unit
+            per_share = "per share" in label.lower() or (decimals and max(abs(v) for v in values) < PER_SHARE_MAX)
+            row_scale = 1.0 if per_share or "%" in line else scale
+            for period, value in zip(periods, values):
+                rows.append((normalize_label(label), label, period, value * row_scale, row_scale, page_number))
+    facts = pd.DataFrame(rows, columns=FACT_COLUMNS)
+    # The same statement often appears twice (e.g. selected data and the statement itself); keep the first
+    return facts.drop_duplicates(subset=["line_item", "period"], keep="first").reset_index(drop=True)
+
+
+class FactStore:
+    """Columnar store of numeric facts parsed from a filing's financial tables.
+
+    Facts live in a pandas DataFrame; a (line item, period) dictionary on top
+    of it makes point lookups a hash probe instead of an LLM round trip.
+    """
+
+    def __init__(self, facts: Optional[pd.DataFrame] = None):
+        self.facts = facts if facts is not None else pd.DataFrame(columns=FACT_COLUMNS)
+        self._index: Dict[Tuple[str, int], int] = {
+            (item, int(period)): i for i, (item, period) in enumerate(zip(self.facts["line_item"], self.facts["period"]))
+        }
+        self.line_items = sorted(set(self.facts["line_item"]))
+
+    @classmethod
+    def from_pages(cls, pages: List[str]) -> "FactStore":
+        return cls(extract_facts(pages))
+
+    def to_records(self) -> List[Dict]:
+        return self.facts.to_dict(orient="records")
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "FactStore":
+        return cls(pd.DataFrame(records, columns=FACT_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def periods(self) -> List[int]:
+        return sorted(set(int(p) for p in self.facts["period"]), reverse=True)
+
+    def match_line_item(self, text: str) -> Optional[str]:
+        """Best line item for a phrase: exact, alias, then the shortest item containing every word"""
+        phrase = normalize_label(ALIASES.get(text.lower().strip(), text))
+        if phrase in self.line_items:
+            return phrase
+        words = [ALIASES.get(w, w) for w in text.lower().split()]
+        tokens = set(normalize_label(" ".join(w for w in words if w not in QUESTION_STOPWORDS)).split())
+        if not tokens:
+            return None
+        candidates = [item for item in self.line_items if tokens <= set(item.split())]
+        return min(candidates, key=len) if candidates else None
+
+    def lookup(self, line_item: str, period: Optional[int] = None) -> Optional[Dict]:
+        """Fact for a line item (matched loosely) in a period, the latest period by default"""
+        item = self.match_line_item(line_item)
+        if item is None:
+            return None
+        periods = [period] if period is not None else self.periods()
+        for p in periods:
+            position = self._index.get((item, int(p)))
+            if position is not None:
+                return self.facts.iloc[position].to_dict()
+        return None
+
+    def answer(self, question: str) -> Optional[Dict]:
+        """Answer "what was / how much <line item> [in <year>]" questions, or None to fall back to retrieval.
+
+        Without a year the latest period is used and the fact is marked ``assumed_period``.
+        """
+        years = [int(y) for y in YEAR.findall(question)]
+        if not years and not NUMERIC_QUESTION.match(question):
+            return None
+        phrase = YEAR.sub(" ", question).strip(" ?.")
+        fact = self.lookup(phrase, years[0] if years else None)
+        if fact is not None:
+            fact["assumed_period"] = not years
+        return fact
+
+    def pivot(self) -> pd.DataFrame:
+        """Line items by period, the way the statements present them"""
+        if self.facts.empty:
+            return self.facts
+        table = self.facts.pivot_table(index="label", columns="period", values="value", aggfunc="first")
+        return table[sorted(table.columns, reverse=True)]
+
+
+def format_fact(fact: Dict) -> str:
+    value = fact["value"]
+    sign = "-" if value < 0 else ""
+    if fact["scale"] == 1.0:
+        amount = f"{value:,.2f}"
+    elif abs(value) >= 1e9:
+        amount = f"{sign}${abs(value) / 1e9:,.2f} billion"
+    else:
+        amount = f"{sign}${abs(value) / 1e6:,.1f} million"
+    text = f"{fact['label']} in {int(fact['period'])}: {amount} (page {int(fact['page'])} of the filing)"
+    if fact.get("assumed_period"):
+        text += f". No year was given, so this is the latest year reported, {int(fact['period'])}"
+    return text
+
+
+def fetch_alpha_vantage_fundamentals(symbol: str, api_key: str) -> Dict[int, Dict[str, float]]:
+    """Fiscal year -> Alpha Vantage annual fundamentals across the three statements"""
+    fundamentals: Dict[int, Dict[str, float]] = {}
+    for function in ALPHA_VANTAGE_FUNCTIONS:
+        response = requests.get("https://www.alphavantage.co/query",
+                                params={"function": function, "symbol": symbol, "apikey": api_key})
+        response.raise_for_status()
+        for report in response.json().get("annualReports", []):
+            year = int(report["fiscalDateEnding"][:4])
+            for field, value in report.items():
+                try:
+                    fundamentals.setdefault(year, {})[field] = float(value)
+                except (TypeError, ValueError):
+                    continue
+    return fundamentals
+
+
+def reconcile(store: FactStore, fundamentals: Dict[int, Dict[str, float]],
+              tolerance: float = RECONCILE_TOLERANCE) -> pd.DataFrame:
+    """Compare filing facts with Alpha Vantage figures for every period both cover"""
+    rows = []
+    for field, names in ALPHA_VANTAGE_LINE_ITEMS.items():
+        item = next((name for name in names if name in store.line_items), None)
+        if item is None:
+            continue
+        for period in store.periods():
+            reported = fundamentals.get(period, {}).get(field)
+            fact = store.lookup(item, period)
+            if reported is None or fact is None or fact["period"] != period:
+                continue
+            difference = (fact["value"] - reported) / abs(reported) if reported else 0.0
+            rows.append({
+                "metric": field,
+                "line_item": fact["label"],
+                "period": period,
+                "filing": fact["value"],
+                "alpha_vantage": reported,
+                "difference": difference,
+                "match": abs(difference) <= tolerance,
+            })
+    return pd.DataFrame(rows, columns=["metric", "line_item", "period", "filing", "alpha_vantage", "difference", "match"])
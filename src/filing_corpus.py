@@ -0,0 +1,162 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+from src.embeddings import get_embedding_model
+from src.embedding_cache import EmbeddingCache
+from src.vector_index import add_vectors_with_ids, search_params
+
+DEFAULT_CORPUS_DIR = Path(__file__).resolve().parent.parent / "corpus"
+
+
+class FilingCorpus:
+    """Vector store holding chunks from many filings.
+
+    Every filing is tagged with ticker, fiscal year and filing type, and owns a
+    contiguous range of chunk IDs in a single ID-mapped FAISS index. Metadata
+    filters are resolved to an ID selector so FAISS only scores chunks from
+    matching filings.
+    """
+
+    def __init__(self, path: Optional[str] = None, model_name: str = 'all-MiniLM-L6-v2', index_backend: str = "auto",
+                 compression: Optional[str] = None, embedding_cache: Optional[EmbeddingCache] = None):
+        self.path = Path(path) if path else DEFAULT_CORPUS_DIR
+        self.model = get_embedding_model(model_name)
+        self.model_name = model_name
+        # Filings are usually processed first, so their chunk embeddings are already cached
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        self.index_backend = index_backend
+        self.compression = compression
+        self.index = None
+        self.filings: Dict[str, Dict] = {}
+        self.texts: Dict[int, str] = {}
+        self.next_id = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def filing_id(ticker: str, fiscal_year: int, filing_type: str) -> str:
+        return f"{ticker.upper()}-{fiscal_year}-{filing_type.upper()}"
+
+    def add_filing(self, chunks: List[str], ticker: str, fiscal_year: int, filing_type: str = "10-K",
+                   embeddings: Optional[np.ndarray] = None) -> str:
+        """Index the chunks of one filing and return its filing ID"""
+        filing_id = self.filing_id(ticker, fiscal_year, filing_type)
+        if not chunks:
+            raise ValueError("No chunks available to add")
+
+        if embeddings is None:
+            embeddings, _ = self.embedding_cache.encode(self.model, self.model_name, chunks)
+
+        with self._lock:
+            if filing_id in self.filings:
+                raise ValueError(f"Filing {filing_id} is already in the corpus")
+            ids = np.arange(self.next_id, self.next_id + len(chunks), dtype='int64')
+            self.index = add_vectors_with_ids(self.index, np.array(embeddings).astype('float32'), ids, self.index_backend, self.compression)
+
+            for chunk_id, text in zip(ids.tolist(), chunks):
+                self.texts[chunk_id] = text
+            self.filings[filing_id] = {
+                "ticker": ticker.upper(),
+                "fiscal_year": int(fiscal_year),
+                "filing_type": filing_type.upper(),
+                "ids": [int(ids[0]), int(ids[-1]) + 1],
+            }
+            self.next_id += len(chunks)
+        return filing_id
+
+    def matching_filings(self, tickers: Optional[Union[str, Iterable[str]]] = None,
+                         fiscal_years: Optional[Tuple[int, int]] = None,
+                         filing_types: Optional[Union[str, Iterable[str]]] = None) -> List[str]:
+        """Return the IDs of filings matching the metadata filter.
+
+        ``fiscal_years`` is an inclusive (first, last) range.
+        """
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        if isinstance(filing_types, str):
+            filing_types = [filing_types]
+        tickers = {t.upper() for t in tickers} if tickers else None
+        filing_types = {t.upper() for t in filing_types} if filing_types else None
+
+        matches = []
+        for filing_id, meta in self.filings.items():
+            if tickers and meta["ticker"] not in tickers:
+                continue
+            if filing_types and meta["filing_type"] not in filing_types:
+                continue
+            if fiscal_years and not fiscal_years[0] <= meta["fiscal_year"] <= fiscal_years[1]:
+                continue
+            matches.append(filing_id)
+        return matches
+
+    def _selector(self, filing_ids: List[str]) -> faiss.IDSelector:
+        ranges = [self.filings[f]["ids"] for f in filing_ids]
+        if len(ranges) == 1:
+            return faiss.IDSelectorRange(*ranges[0])
+        ids = np.concatenate([np.arange(start, end, dtype='int64') for start, end in ranges])
+        return faiss.IDSelectorBatch(ids)
+
+    def search(self, query: str, k: int = 5, tickers: Optional[Union[str, Iterable[str]]] = None,
+               fiscal_years: Optional[Tuple[int, int]] = None,
+               filing_types: Optional[Union[str, Iterable[str]]] = None) -> List[Dict]:
+        """Search the corpus, optionally restricted by ticker, fiscal year range and filing type"""
+        query_vector = np.array(self.model.encode([query])).astype('float32')
+
+        # Shared across sessions, so reads must not interleave with add_filing / load
+        with self._lock:
+            if self.index is None:
+                raise ValueError("Corpus is empty. Please add a filing first.")
+
+            params = None
+            if tickers or fiscal_years or filing_types:
+                filing_ids = self.matching_filings(tickers, fiscal_years, filing_types)
+                if not filing_ids:
+                    return []
+                params = search_params(self.index, self._selector(filing_ids))
+
+            distances, indices = self.index.search(query_vector, k, params=params)
+
+            results = []
+            for distance, chunk_id in zip(distances[0], indices[0]):
+                if chunk_id < 0:
+                    continue
+                results.append({
+                    "text": self.texts[int(chunk_id)],
+                    "filing_id": self._filing_of(int(chunk_id)),
+                    "distance": float(distance),
+                })
+            return results
+
+    def _filing_of(self, chunk_id: int) -> Optional[str]:
+        for filing_id, meta in self.filings.items():
+            start, end = meta["ids"]
+            if start <= chunk_id < end:
+                return filing_id
+        return None
+
+    def exists(self) -> bool:
+        return (self.path / "index.faiss").exists()
+
+    def save(self):
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            faiss.write_index(self.index, str(self.path / "index.faiss"))
+            with open(self.path / "filings.json", 'w') as f:
+                json.dump({"filings": self.filings, "next_id": self.next_id}, f)
+            with open(self.path / "texts.json", 'w') as f:
+                json.dump(self.texts, f)
+
+    def load(self):
+        with self._lock:
+            self.index = faiss.read_index(str(self.path / "index.faiss"))
+            with open(self.path / "filings.json", 'r') as f:
+                meta = json.load(f)
+            self.filings = meta["filings"]
+            self.next_id = meta["next_id"]
+            with open(self.path / "texts.json", 'r') as f:
+                self.texts = {int(k): v for k, v in json.load(f).items()}
+        return self
@@ -0,0 +1,111 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# Below this shingle similarity a section counts as materially changed
+CHANGE_THRESHOLD = 0.85
+SHINGLE_SIZE = 5
+# Fiscal years roll forward every filing without the text changing in substance
+YEAR = re.compile(r"\b(19|20)\d{2}\b")
+WORD = re.compile(r"[a-z0-9$%.,]+")
+
+ANALYSIS_FILE = "analysis"
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(WORD.findall(title.lower()))
+
+
+def section_texts(processor) -> Dict[str, Tuple[str, str]]:
+    """Section key -> (title, text) rebuilt from a processor's chunks"""
+    return {
+        key: (section["title"], " ".join(processor.chunks[section["start"]:section["end"]]))
+        for key, section in processor.sections.items()
+    }
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    words = WORD.findall(YEAR.sub("<year>", text.lower()))
+    return {hash(tuple(words[i:i + size])) for i in range(max(len(words) - size + 1, 1))}
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of word shingles; 1.0 means the same wording"""
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb) if sa or sb else 1.0
+
+
+def align_sections(prior: Dict[str, Tuple[str, str]], current: Dict[str, Tuple[str, str]]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Pair prior and current section keys by key, then by normalized title, in current order"""
+    unmatched = {normalize_title(prior[key][0]): key for key in prior if key not in current}
+    pairs = []
+    for key, (title, _) in current.items():
+        pairs.append((key if key in prior else unmatched.pop(normalize_title(title), None), key))
+    pairs.extend((key, None) for key in unmatched.values())
+    return pairs
+
+
+def diff_filings(prior, current, threshold: float = CHANGE_THRESHOLD) -> List[Dict]:
+    """Compare two processed filings section by section.
+
+    Returns one entry per aligned section with its status ("unchanged",
+    "changed", "added" or "removed") and shingle similarity, in the current
+    filing's order with removed sections last.
+    """
+    prior_sections, current_sections = section_texts(prior), section_texts(current)
+    diff = []
+    for prior_key, current_key in align_sections(prior_sections, current_sections):
+        if prior_key is None:
+            status, score = "added", 0.0
+        elif current_key is None:
+            status, score = "removed", 0.0
+        else:
+            score = similarity(prior_sections[prior_key][1], current_sections[current_key][1])
+            status = "unchanged" if score >= threshold else "changed"
+        title = (current_sections.get(current_key) or prior_sections[prior_key])[0]
+        diff.append({
+            "section": current_key or prior_key,
+            "prior_section": prior_key,
+            "title": title,
+            "status": status,
+            "similarity": round(score, 3),
+        })
+    return diff
+
+
+def stale_analysis_sections(diff: List[Dict], section_sources: Dict[str, Optional[List[str]]], prior, current) -> Set[str]:
+    """Analysis sections whose supporting filing sections changed and must be regenerated.
+
+    ``section_sources`` maps every analysis section to the filing section
+    names it searches. An analysis section without matching filing sections
+    searches the whole document, so it is stale whenever anything changed.
+    """
+    changed = set()
+    for entry in diff:
+        if entry["status"] != "unchanged":
+            changed.update(key for key in (entry["section"], entry["prior_section"]) if key)
+
+    stale = set()
+    for name, sources in section_sources.items():
+        supporting = set(current.matching_sections(sources)) | set(prior.matching_sections(sources))
+        if (supporting & changed) if supporting else changed:
+            stale.add(name)
+    return stale
+
+
+def load_analysis(processor) -> Optional[Dict[str, Dict]]:
+    """Analysis results previously stored next to the processor's cached index"""
+    if not processor.cache_key:
+        return None
+    return processor.cache.load_json(processor.cache_key, ANALYSIS_FILE)
+
+
+def save_analysis(processor, results: Dict[str, Dict]) -> None:
+    """Store analysis results for reuse by later filings, leaving out failed fields"""
+    if not processor.cache_key:
+        return
+    answered = {
+        section: {field: response for field, response in fields.items()
+                  if not (isinstance(response, dict) and "error" in response.get("structured_analysis", {}))}
+        for section, fields in results.items()
+    }
+    processor.cache.save_json(processor.cache_key, ANALYSIS_FILE, answered)
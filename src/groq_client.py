@@ -1,11 +1,15 @@
+from typing import Dict, Optional
+
 from groq import Groq
 import streamlit as st
 
 def get_groq_client():
     return Groq(api_key=st.secrets["groq_api_key"])
 
-def get_completion(prompt: str, model: str = "llama-3.2-90b-text-preview") -> str:
+def get_completion(prompt: str, model: str = "llama-3.2-90b-text-preview", response_format: Optional[Dict] = None) -> str:
+    """Completion text for a prompt; pass response_format={"type": "json_object"} for JSON mode"""
     client = get_groq_client()
+    options = {"response_format": response_format} if response_format else {}
     response = client.chat.completions.create(
         model=model,
         messages=[
@@ -13,6 +17,15 @@ def get_completion(prompt: str, model: str = "llama-3.2-90b-text-preview") -> st
                 "role": "user",
                 "content": prompt
             }
-        ]
+        ],
+        **options
     )
-    return response.choices[0].message.content 
\ No newline at end of file
+    return response.choices[0].message.content
+
+def failed_generation(error: Exception) -> Optional[str]:
+    """Text Groq generated before rejecting it in JSON mode (code json_validate_failed), if any"""
+    body = getattr(error, "body", None)
+    if not isinstance(body, dict):
+        return None
+    details = body.get("error", body)
+    return details.get("failed_generation") if isinstance(details, dict) else None
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+
+# Cached indexes live next to the generated PDFs, under the project root
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "index_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+
+
+class IndexCache:
+    """Persistent, size-bounded cache of processed documents.
+
+    Each entry is a directory named after the content hash of the uploaded
+    document holding the FAISS index and the chunk store. Entries are evicted
+    least-recently-used first once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: bytes, *params: Any) -> str:
+        """Hash the document bytes together with the processing parameters"""
+        digest = hashlib.sha256(data)
+        for param in params:
+            digest.update(f"|{param}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def contains(self, key: str) -> bool:
+        return (self._entry_dir(key) / INDEX_FILE).exists()
+
+    def load(self, key: str) -> Optional[Tuple[faiss.Index, List[str], Dict[str, Any]]]:
+        """Return (index, chunks, metadata) for a cached document, or None"""
+        entry = self._entry_dir(key)
+        try:
+            index = faiss.read_index(str(entry / INDEX_FILE))
+            with open(entry / CHUNKS_FILE, "r") as f:
+                payload = json.load(f)
+        except (OSError, RuntimeError, ValueError):
+            return None
+
+        self._touch(entry)
+        return index, payload["chunks"], payload.get("metadata", {})
+
+    def save(self, key: str, index: faiss.Index, chunks: List[str], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Persist a processed document and evict old entries if over budget"""
+        entry = self._entry_dir(key)
+        # Write into a scratch directory first so readers never see a partial entry
+        tmp_dir = self.cache_dir / f".tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir(parents=True)
+        try:
+            faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+            with open(tmp_dir / CHUNKS_FILE, "w") as f:
+                json.dump({"chunks": chunks, "metadata": metadata or {}}, f)
+            # Auxiliary artifacts (analysis, summaries) describe the same document, so keep them
+            if entry.exists():
+                for path in entry.glob("*.json"):
+                    if path.name != CHUNKS_FILE:
+                        shutil.copy2(path, tmp_dir / path.name)
+                shutil.rmtree(entry, ignore_errors=True)
+            tmp_dir.rename(entry)
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._touch(entry)
+        self.evict(keep=key)
+
+    def load_json(self, key: str, name: str) -> Optional[Any]:
+        """Read an auxiliary JSON artifact stored alongside a cached document"""
+        path = self._entry_dir(key) / f"{name}.json"
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_json(self, key: str, name: str, data: Any) -> None:
+        """Store an auxiliary JSON artifact alongside a cached document"""
+        entry = self._entry_dir(key)
+        if not entry.exists():
+            return
+        tmp_path = entry / f".{name}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        tmp_path.replace(entry / f"{name}.json")
+        self._touch(entry)
+        self.evict(keep=key)
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """List (key, size in bytes, last access time) for every cached document"""
+        result = []
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+                result.append((entry.name, size, entry.stat().st_mtime))
+            except OSError:
+                continue
+        return result
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes"""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def _touch(entry: Path) -> None:
+        now = time.time()
+        try:
+            os.utime(entry, (now, now))
+        except OSError:
+            pass
@@ -0,0 +1,79 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class IndexRegistry:
+    """Process-wide memory governor for per-session document indexes.
+
+    Every session's DocumentProcessor is registered here. Once the indexes,
+    chunks and keyword indexes resident across all sessions exceed
+    ``max_bytes``, the least recently used sessions are released back to the
+    on-disk index cache; they reload transparently on their next search.
+    Processors are held by weak reference, so sessions that end drop out.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # Session ID -> processor, least recently used first
+        self._sessions: "OrderedDict[str, weakref.ref]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, processor) -> None:
+        """Track a session's processor, replacing any previous one"""
+        processor.registry = self
+        processor.session_id = session_id
+        with self._lock:
+            self._sessions[session_id] = weakref.ref(processor)
+            self._sessions.move_to_end(session_id)
+        self.enforce(keep=session_id)
+
+    def unregister(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def touch(self, session_id: str) -> None:
+        """Mark a session as just used and evict others if over budget"""
+        with self._lock:
+            if session_id not in self._sessions:
+                return
+            self._sessions.move_to_end(session_id)
+        self.enforce(keep=session_id)
+
+    def _live_sessions(self) -> List[Tuple[str, object]]:
+        with self._lock:
+            live = []
+            for session_id, ref in list(self._sessions.items()):
+                processor = ref()
+                if processor is None:
+                    del self._sessions[session_id]
+                else:
+                    live.append((session_id, processor))
+            return live
+
+    def resident_bytes(self) -> Dict[str, int]:
+        """Approximate bytes each session currently holds in memory"""
+        return {session_id: processor.resident_bytes() for session_id, processor in self._live_sessions()}
+
+    def total_bytes(self) -> int:
+        return sum(self.resident_bytes().values())
+
+    def enforce(self, keep: Optional[str] = None) -> List[str]:
+        """Release least recently used sessions until under budget; returns the evicted session IDs"""
+        sessions = self._live_sessions()
+        sizes = {session_id: processor.resident_bytes() for session_id, processor in sessions}
+        total = sum(sizes.values())
+        evicted = []
+        for session_id, processor in sessions:
+            if total <= self.max_bytes:
+                break
+            if session_id == keep or not sizes[session_id]:
+                continue
+            # Sessions in the middle of a search are skipped rather than waited on
+            if processor.release():
+                total -= sizes[session_id]
+                evicted.append(session_id)
+        return evicted
@@ -26,6 +26,9 @@ if "news" not in st.session_state:
 if "all_outputs" not in st.session_state:
     st.session_state.all_outputs = None
 
+if "report_pdf" not in st.session_state:
+    st.session_state.report_pdf = None
+
 # Initialize insight states
 from src.fields2 import inc_stat_attributes, balance_sheet_attributes, cashflow_attributes
 
@@ -72,7 +75,7 @@ from src.cash_flow import cash_flow
 from src.news_sentiment import top_news
 from src.company_overview import company_overview
 from src.utils import round_numeric, format_currency, create_donut_chart, create_bar_chart
-from src.pdf_gen import gen_pdf
+from src.pdf_gen import DEFAULT_PERSIST_REPORTS, gen_pdf
 from src.fields2 import inc_stat, inc_stat_attributes, bal_sheet, balance_sheet_attributes, cashflow, cashflow_attributes
 from src.components.chat import chat_interface
 
@@ -128,6 +131,8 @@ with col2:
     if ticker:
         if st.button("Generate Insights", key="generate_insights"):
             with st.status("**Generating Insights...**"):
+                # Insights may change, so an earlier report is stale
+                st.session_state.report_pdf = None
                 if not st.session_state.company_overview:
                     st.write("Getting company overview...")
                     st.session_state.company_overview = company_overview(ticker)
@@ -432,6 +437,32 @@ with col2:
 
                     st.dataframe(st.session_state.news["news"], column_config=column_config)
 
+# PDF report, built in memory per session
+if st.session_state.all_outputs:
+    st.markdown("---")
+    overview = st.session_state.company_overview
+    if st.button("Generate PDF", key="generate_pdf"):
+        with st.spinner("Generating PDF report..."):
+            st.session_state.report_pdf = gen_pdf(
+                overview.get("Name") or ticker,
+                overview,
+                st.session_state.income_statement,
+                st.session_state.balance_sheet,
+                st.session_state.cash_flow,
+                st.session_state.news,
+                persist=bool(st.secrets.get("persist_reports", DEFAULT_PERSIST_REPORTS))
+            )
+        if st.session_state.report_pdf is None:
+            st.error("Error generating PDF report.")
+    if st.session_state.report_pdf:
+        st.download_button(
+            "Download PDF",
+            data=st.session_state.report_pdf,
+            file_name=f"{overview.get('Symbol') or ticker}_report.pdf",
+            mime="application/pdf",
+            key="download_pdf"
+        )
+
 # Add chat interface
 if st.session_state.all_outputs:
     st.markdown("---")
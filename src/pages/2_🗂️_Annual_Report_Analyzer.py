@@ -5,16 +5,34 @@ project_root = script_dir.parent
 sys.path.append(str(project_root))
 
 from src.document_processor import DocumentProcessor
+from src.filing_corpus import FilingCorpus
+from src.index_registry import IndexRegistry, DEFAULT_MAX_BYTES
+from src.cpu_scheduler import CpuScheduler
+from src.filing_diff import diff_filings, stale_analysis_sections, load_analysis, save_analysis
+from src.fact_store import fetch_alpha_vantage_fundamentals, reconcile
 from src.fields2 import (
     fiscal_year, fiscal_year_attributes,
     strat_outlook, strat_outlook_attributes,
     risk_management, risk_management_attributes,
     innovation, innovation_attributes
 )
-from src.components.chat import chat_interface
+from src.components.chat import chat_interface, reset_chat_state
 
 import streamlit as st
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_ANALYSIS_CONCURRENCY = 4
+
+# Filing sections each analysis section searches: 10-K item keys, plus
+# title keywords for annual reports without item numbering
+SECTION_SOURCES = {
+    "Fiscal Year Highlights": ["Item 7", "Item 8", "highlights", "financial review"],
+    "Strategy & Outlook": ["Item 1", "Item 7", "strategy", "outlook"],
+    "Risk Management": ["Item 1A", "Item 7A", "risk"],
+    "Innovation & R&D": ["Item 1", "Item 7", "research", "innovation"]
+}
 
 st.set_page_config(
     page_title="Annual Report Analyzer", 
@@ -39,58 +57,270 @@ def initialize_session_state():
         st.session_state.analysis_complete = False
     if "results" not in st.session_state:
         st.session_state.results = {}
+    if "filing_diff" not in st.session_state:
+        st.session_state.filing_diff = None
+    if "corpus_results" not in st.session_state:
+        st.session_state.corpus_results = None
+    if "fact_check" not in st.session_state:
+        st.session_state.fact_check = None
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+@st.cache_resource
+def get_index_registry():
+    """Process-wide cap on the document indexes held in memory across sessions"""
+    budget_mb = st.secrets.get("index_memory_budget_mb")
+    return IndexRegistry(int(budget_mb) * 1024 * 1024 if budget_mb else DEFAULT_MAX_BYTES)
+
+@st.cache_resource
+def get_cpu_scheduler():
+    """Process-wide limit on concurrent ingest jobs and their torch / FAISS threads"""
+    max_jobs = st.secrets.get("ingest_concurrency")
+    # The encoder's thread count, if set, so the scheduler does not override it
+    threads = st.secrets.get("embedding_threads")
+    return CpuScheduler(max_jobs=int(max_jobs) if max_jobs else None, threads_per_job=int(threads) if threads else None)
+
+def summarize_document(processor):
+    """Map-reduce summaries of every section, so analysis sees the whole report"""
+    try:
+        progress_bar = st.progress(0, text="Summarising document sections...")
+        processor.summarize(
+            max_workers=get_analysis_concurrency(),
+            progress=lambda done, total: progress_bar.progress(done / total, text=f"Summarising document sections ({done}/{total})...")
+        )
+        progress_bar.empty()
+    except Exception as e:
+        st.warning(f"Could not summarise document, analysing from retrieved excerpts only: {str(e)}")
 
-def process_document(pdf):
+def build_summary_tree(processor):
+    """Cluster summaries up to a document root, so broad questions are answered from the right level"""
     try:
-        with st.spinner("Processing document..."):
-            processor = DocumentProcessor()
+        progress_bar = st.progress(0, text="Building summary tree...")
+        processor.build_tree(
+            max_workers=get_analysis_concurrency(),
+            progress=lambda done, total: progress_bar.progress(min(done / total, 1.0), text=f"Building summary tree ({done}/{total})...")
+        )
+        progress_bar.empty()
+    except Exception as e:
+        st.warning(f"Could not build summary tree, answering from chunks only: {str(e)}")
+
+def process_document(pdf, summarize=False, summary_tree=False):
+    try:
+        scheduler = get_cpu_scheduler()
+        spinner = "Processing document..."
+        if scheduler.running >= scheduler.max_jobs:
+            spinner = f"Waiting for a free slot ({scheduler.waiting + 1} queued), then processing document..."
+        with st.spinner(spinner), scheduler.job("ingest") as job:
+            processor = DocumentProcessor(compression=st.secrets.get("index_compression"), use_tree=summary_tree)
             chunks = processor.process_pdf(pdf)
-            if chunks:
-                success = processor.create_index()
-                if success:
-                    st.session_state.processor = processor
-                    st.session_state.processed = True
-                    st.success("Document processed successfully!")
-                    return True
+            success = bool(chunks) and processor.create_index()
+        if success:
+            if summarize:
+                summarize_document(processor)
+            if summary_tree:
+                build_summary_tree(processor)
+            get_index_registry().register(st.session_state.session_id, processor)
+            st.session_state.processor = processor
+            # Earlier turns and their summary are about the previous document
+            reset_chat_state()
+            st.session_state.fact_check = None
+            st.session_state.processed = True
+            if processor.from_cache:
+                st.success("Document loaded from cache!")
+            else:
+                st.success("Document processed successfully!")
+                if processor.cleaning_stats.get("lines_removed"):
+                    st.caption(f"Stripped {processor.cleaning_stats['lines_removed']} header, footer and contents lines before indexing")
+                if processor.embedding_stats:
+                    stats = processor.embedding_stats
+                    st.caption(f"Embedding cache: {stats['cache_hits']} of {stats['chunks']} chunks reused ({stats['hit_rate']:.0%} hit rate)")
+            st.caption(f"Queued {job.queued_seconds:.1f}s, processed in {job.run_seconds:.1f}s on {job.threads} threads")
+            return True
     except Exception as e:
         st.error(f"Error processing document: {str(e)}")
     return False
 
-def analyze_report():
+@st.cache_resource
+def get_filing_corpus():
+    """Process-wide corpus of indexed filings, shared by all sessions"""
+    corpus = FilingCorpus()
+    if corpus.exists():
+        corpus.load()
+    return corpus
+
+def add_to_corpus(ticker, fiscal_year, filing_type):
     try:
-        processor = st.session_state.processor
-        results = {}
-        
-        with st.spinner("Analyzing report..."):
-            sections = {
-                "Fiscal Year Highlights": (fiscal_year_attributes, 1),
-                "Strategy & Outlook": (strat_outlook_attributes, 2),
-                "Risk Management": (risk_management_attributes, 3),
-                "Innovation & R&D": (innovation_attributes, 4)
-            }
-            
-            progress_bar = st.progress(0)
-            total_sections = len(sections)
-            
-            for idx, (section_name, (attributes, section_num)) in enumerate(sections.items()):
-                section_results = {}
-                st.write(f"Analyzing {section_name}...")
-                
-                for field in attributes:
-                    formatted_field = field.replace('_', ' ').title()
-                    query = f"What are the {formatted_field} in the {section_name} section?"
-                    response = processor.query(query)
-                    section_results[formatted_field] = response
-                
-                results[section_name] = section_results
-                progress_bar.progress((idx + 1) / total_sections)
-        
-        st.session_state.results = results
-        st.session_state.analysis_complete = True
-        st.success("Analysis complete!")
-        
+        with st.spinner("Adding filing to corpus..."), get_cpu_scheduler().job("corpus"):
+            corpus = get_filing_corpus()
+            processor = st.session_state.processor
+            with processor.loaded():
+                filing_id = corpus.add_filing(processor.chunks, ticker, fiscal_year, filing_type)
+            corpus.save()
+        st.success(f"Added {filing_id} to the filing corpus!")
+    except Exception as e:
+        st.error(f"Error adding filing to corpus: {str(e)}")
+
+def search_corpus(query, tickers, fiscal_years):
+    try:
+        tickers = [t.strip() for t in tickers.split(",") if t.strip()]
+        st.session_state.corpus_results = get_filing_corpus().search(query, k=5, tickers=tickers or None, fiscal_years=fiscal_years)
+    except Exception as e:
+        st.error(f"Error searching filing corpus: {str(e)}")
+
+def display_corpus_results():
+    results = st.session_state.corpus_results
+    if results is None:
+        return
+    st.write("## Filing Corpus Results")
+    if not results:
+        st.info("No filings in the corpus match these filters.")
+    for result in results:
+        with st.expander(f"📄 {result['filing_id']}"):
+            st.markdown(format_display_value(result["text"]))
+
+def build_analysis_questions():
+    """Return (section name, field, question) for every field of the fixed analysis"""
+    sections = {
+        "Fiscal Year Highlights": fiscal_year_attributes,
+        "Strategy & Outlook": strat_outlook_attributes,
+        "Risk Management": risk_management_attributes,
+        "Innovation & R&D": innovation_attributes
+    }
+
+    questions = []
+    for section_name, attributes in sections.items():
+        for field in attributes:
+            formatted_field = field.replace('_', ' ').title()
+            query = f"What are the {formatted_field} in the {section_name} section?"
+            questions.append((section_name, formatted_field, query))
+    return questions
+
+def get_analysis_concurrency():
+    """Maximum number of LLM calls analyze_report runs at once"""
+    return int(st.secrets.get("analysis_concurrency", DEFAULT_ANALYSIS_CONCURRENCY))
+
+def analyze_report(reused_results=None):
+    """Answer every analysis question; fields present in reused_results are kept instead of regenerated"""
+    processor = st.session_state.processor
+    reused_results = reused_results or {}
+    results = {section: dict(fields) for section, fields in reused_results.items()}
+
+    try:
+        all_questions = build_analysis_questions()
+        questions = [q for q in all_questions if q[1] not in reused_results.get(q[0], {})]
+
+        # Retrieve context for every question in one encode and one FAISS search per filing slice
+        with st.spinner("Retrieving relevant sections..."):
+            relevant_chunks = processor.search_batch(
+                [q for _, _, q in questions],
+                cache_embeddings=True,
+                sections=[SECTION_SOURCES.get(section_name) for section_name, _, _ in questions]
+            ) if questions else []
     except Exception as e:
         st.error(f"Error during analysis: {str(e)}")
+        return
+
+    st.write("Analyzing report...")
+    progress_bar = st.progress(0)
+    live_results = st.empty()
+    live_container = live_results.container()
+    failed_fields = []
+
+    with ThreadPoolExecutor(max_workers=get_analysis_concurrency()) as executor:
+        futures = {
+            executor.submit(processor.generate_answer, query, processor.with_summaries(chunks, SECTION_SOURCES.get(section_name))): (section_name, formatted_field)
+            for (section_name, formatted_field, query), chunks in zip(questions, relevant_chunks)
+        }
+
+        # Render each field as soon as its completion arrives; a failure only affects that field
+        for done, future in enumerate(as_completed(futures), start=1):
+            section_name, formatted_field = futures[future]
+            try:
+                response = future.result()
+            except Exception as e:
+                response = DocumentProcessor.error_response(e)
+                failed_fields.append(formatted_field)
+
+            results.setdefault(section_name, {})[formatted_field] = response
+            with live_container.expander(f"📊 {section_name}: {formatted_field}"):
+                display_response(response)
+            progress_bar.progress(done / len(futures))
+
+    # Keep the fixed section/field order for the final display
+    ordered_results = {}
+    for section_name, formatted_field, _ in all_questions:
+        ordered_results.setdefault(section_name, {})[formatted_field] = results[section_name][formatted_field]
+
+    # Stored with the cached index so next year's filing can reuse unchanged fields
+    save_analysis(processor, ordered_results)
+    st.session_state.results = ordered_results
+    st.session_state.analysis_complete = True
+    live_results.empty()
+
+    if failed_fields:
+        st.warning(f"Analysis complete, but these fields failed: {', '.join(failed_fields)}")
+    else:
+        st.success("Analysis complete!")
+
+def analyze_changes(prior_pdf):
+    """Diff against last year's filing and regenerate only fields whose sections changed"""
+    processor = st.session_state.processor
+    try:
+        with st.spinner("Comparing with prior year filing..."), get_cpu_scheduler().job("diff"):
+            prior = DocumentProcessor(compression=st.secrets.get("index_compression"))
+            if not prior.process_pdf(prior_pdf):
+                return
+            with processor.loaded():
+                diff = diff_filings(prior, processor)
+                stale = stale_analysis_sections(diff, SECTION_SOURCES, prior, processor)
+            cached = load_analysis(prior) or {}
+    except Exception as e:
+        st.error(f"Error comparing filings: {str(e)}")
+        return
+
+    reused = {section: fields for section, fields in cached.items() if section not in stale}
+    st.session_state.filing_diff = {"sections": diff, "regenerated": sorted(set(SECTION_SOURCES) - set(reused)), "reused": sorted(reused)}
+    if not cached:
+        st.info("No stored analysis for the prior year filing, so every field is generated.")
+    analyze_report(reused)
+
+def display_filing_diff():
+    diff = st.session_state.filing_diff
+    if not diff:
+        return
+    st.write("## Changes Since Prior Year")
+    changed = [d for d in diff["sections"] if d["status"] != "unchanged"]
+    st.markdown(f"**{len(changed)}** of {len(diff['sections'])} filing sections changed materially.")
+    if diff["reused"]:
+        st.markdown(f"Reused from last year's analysis: {', '.join(diff['reused'])}")
+    if diff["regenerated"]:
+        st.markdown(f"Regenerated: {', '.join(diff['regenerated'])}")
+    st.dataframe(
+        [{"Section": d["section"], "Title": d["title"], "Status": d["status"], "Similarity": d["similarity"]} for d in diff["sections"]],
+        use_container_width=True
+    )
+
+def check_facts(ticker):
+    """Reconcile the filing's table figures with Alpha Vantage fundamentals"""
+    try:
+        with st.spinner("Fetching Alpha Vantage fundamentals..."):
+            fundamentals = fetch_alpha_vantage_fundamentals(ticker, st.secrets["av_api_key"])
+        st.session_state.fact_check = reconcile(st.session_state.processor.facts, fundamentals)
+        if st.session_state.fact_check.empty:
+            st.warning("No filing figures overlap the Alpha Vantage fundamentals for this ticker.")
+    except Exception as e:
+        st.error(f"Error checking figures: {str(e)}")
+
+def display_facts():
+    facts = st.session_state.processor.facts
+    if not len(facts):
+        return
+    with st.expander(f"📑 Figures from Financial Tables ({len(facts)} facts)"):
+        st.dataframe(facts.pivot(), use_container_width=True)
+        check = st.session_state.fact_check
+        if check is not None and not check.empty:
+            st.markdown(f"**Alpha Vantage check:** {int(check['match'].sum())} of {len(check)} figures agree within 1%")
+            st.dataframe(check, use_container_width=True)
 
 def format_display_value(value):
     """Format values for display, escaping dollar signs"""
@@ -98,6 +328,33 @@ def format_display_value(value):
         return value.replace("$", "\\$")
     return value
 
+def display_response(response):
+    try:
+        if isinstance(response, dict) and "structured_analysis" in response:
+            analysis = response["structured_analysis"]
+
+            if "error" in analysis:
+                st.error(f"{analysis['error']} {analysis.get('details', '')}")
+                return
+            
+            # Key Findings
+            st.markdown("### Key Findings")
+            st.markdown(format_display_value(analysis["key_findings"]))
+            
+            # Detailed Analysis
+            st.markdown("### Detailed Analysis")
+            st.markdown(format_display_value(analysis["detailed_analysis"]))
+            
+            # Summary
+            st.markdown("### Summary")
+            st.markdown(format_display_value(analysis["summary"]))
+        else:
+            # Handle plain text responses
+            st.markdown(format_display_value(str(response)))
+            
+    except Exception as e:
+        st.error(f"Error displaying results: {str(e)}")
+
 def display_results():
     if st.session_state.analysis_complete:
         st.write("## Analysis Results")
@@ -109,27 +366,7 @@ def display_results():
                 
                 for field, response in insights.items():
                     with st.expander(f"📊 {field}"):
-                        try:
-                            if isinstance(response, dict) and "structured_analysis" in response:
-                                analysis = response["structured_analysis"]
-                                
-                                # Key Findings
-                                st.markdown("### Key Findings")
-                                st.markdown(format_display_value(analysis["key_findings"]))
-                                
-                                # Detailed Analysis
-                                st.markdown("### Detailed Analysis")
-                                st.markdown(format_display_value(analysis["detailed_analysis"]))
-                                
-                                # Summary
-                                st.markdown("### Summary")
-                                st.markdown(format_display_value(analysis["summary"]))
-                            else:
-                                # Handle plain text responses
-                                st.markdown(format_display_value(str(response)))
-                                
-                        except Exception as e:
-                            st.error(f"Error displaying results: {str(e)}")
+                        display_response(response)
                 
                 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -146,12 +383,66 @@ def main():
         )
         
         if pdf_file:
+            summarize = st.checkbox(
+                "Summarise whole document",
+                value=bool(st.secrets.get("summary_mode", False)),
+                help="Summarises every section once at ingest (cached) so broad questions cover the full report. Slower to process."
+            )
+            summary_tree = st.checkbox(
+                "Build summary tree",
+                value=bool(st.secrets.get("summary_tree", False)),
+                help="Clusters and summarises chunks up to a document overview (cached) and routes each chat question to the right level."
+            )
             if st.button("Process Document", key="process_doc"):
-                process_document(pdf_file)
+                process_document(pdf_file, summarize, summary_tree)
         
         if st.session_state.processed:
             if st.button("Analyze Report", key="analyze_report"):
+                st.session_state.filing_diff = None
                 analyze_report()
+
+            with st.expander("Compare with Prior Year"):
+                prior_pdf = st.file_uploader(
+                    "Prior Year Report (PDF)",
+                    type="pdf",
+                    key="prior_pdf",
+                    help="Only analysis sections backed by changed filing sections are regenerated."
+                )
+                if prior_pdf and st.button("Analyze Changes", key="analyze_changes"):
+                    analyze_changes(prior_pdf)
+
+            with st.expander("Add to Filing Corpus"):
+                corpus_ticker = st.text_input("Ticker", key="corpus_ticker", help="Example: AAPL for Apple Inc.")
+                corpus_year = st.number_input("Fiscal Year", min_value=1990, max_value=2100, value=2022, step=1, key="corpus_year")
+                corpus_type = st.selectbox("Filing Type", ["10-K", "20-F", "10-Q", "Annual Report"], key="corpus_type")
+                if corpus_ticker and st.button("Add to Corpus", key="add_to_corpus"):
+                    add_to_corpus(corpus_ticker, int(corpus_year), corpus_type)
+
+            if len(st.session_state.processor.facts):
+                with st.expander("Check Figures Against Alpha Vantage"):
+                    check_ticker = st.text_input("Ticker", key="check_ticker", help="Example: AAPL for Apple Inc.")
+                    if check_ticker and st.button("Check Figures", key="check_figures"):
+                        check_facts(check_ticker)
+
+            registry = get_index_registry()
+            resident = registry.resident_bytes()
+            st.caption(
+                f"Index memory: {resident.get(st.session_state.session_id, 0) / 1e6:.1f} MB this session, "
+                f"{sum(resident.values()) / 1e6:.1f} / {registry.max_bytes / 1e6:.0f} MB across sessions"
+            )
+            ingest = get_cpu_scheduler().stats()
+            st.caption(
+                f"Ingest jobs: {ingest['running']} running, {ingest['waiting']} queued, "
+                f"mean wait {ingest['mean_wait_s']:.1f}s, mean run {ingest['mean_run_s']:.1f}s"
+            )
+
+        if get_filing_corpus().filings:
+            with st.expander("Search Filing Corpus"):
+                corpus_query = st.text_input("Question", key="corpus_query", help="Searched across every filing added to the corpus.")
+                corpus_tickers = st.text_input("Tickers", key="corpus_tickers", help="Comma separated, e.g. AAPL, MSFT. Leave empty for all.")
+                corpus_years = st.slider("Fiscal Years", 1990, 2100, (2015, 2030), key="corpus_years")
+                if corpus_query and st.button("Search Corpus", key="search_corpus"):
+                    search_corpus(corpus_query, corpus_tickers, corpus_years)
         
         # Example reports info
         st.markdown("---")
@@ -166,8 +457,11 @@ def main():
     # Main content area
     if st.session_state.processed:
         st.success("✅ Document is processed and ready for analysis")
+        display_facts()
     
     # Display results
+    display_corpus_results()
+    display_filing_diff()
     display_results()
     
     # Add chat interface after results display
@@ -175,13 +469,12 @@ def main():
         st.markdown("---")
         st.subheader("💬 Chat with Your Document")
         
-        # Create context from analysis results and original document
+        # Document excerpts are retrieved per question from the processor's index
         chat_context = {
-            "Analysis Results": st.session_state.results,
-            "Document Chunks": st.session_state.processor.chunks if st.session_state.processor else []
+            "Analysis Results": st.session_state.results
         }
         
-        chat_interface(chat_context)
+        chat_interface(chat_context, processor=st.session_state.processor)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,10 @@
 from io import BytesIO
+import hashlib
 import json
+import os
+import re
 import sys
+import uuid
 from pathlib import Path
 script_dir = Path(__file__).resolve().parent
 project_root = script_dir.parent
@@ -15,8 +19,7 @@ from reportlab.lib.pagesizes import landscape
 from reportlab.platypus import Paragraph, Table, TableStyle, Spacer
 from reportlab.lib import colors
 import plotly.io as pio
-from io import BytesIO
-import tempfile
+import pandas as pd
 
 from groq import Groq
 
@@ -27,6 +30,15 @@ from src.cash_flow import cash_flow
 from src.news_sentiment import top_news
 from src.utils import round_numeric, create_donut_chart, create_bar_chart, get_pdf_path
 from src.groq_client import get_completion
+from src.chart_renderer import DEFAULT_RENDER_TIMEOUT, ChartImage, get_chart_renderer
+from src.settings import get_setting
+
+# Persisted reports, under the pdf directory
+REPORTS_DIR = "reports"
+# Bump when the report layout changes so persisted reports are rebuilt
+REPORT_VERSION = 1
+# Overridden by the persist_reports secret in the app
+DEFAULT_PERSIST_REPORTS = True
 
 # Get the default styles
 styles = getSampleStyleSheet()
@@ -107,12 +119,9 @@ sub_header_style = ParagraphStyle(
 )
 
 def pdf_plotly_chart(fig):
-    img_bytes = fig.to_image(format="png")
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    temp_file.write(img_bytes)
-    temp_file.close()
-    img = Image(temp_file.name, width=5*inch, height=3*inch)
-    return img
+    # Rendered in the background by the shared renderer pool; drawn once the report is built
+    return ChartImage(get_chart_renderer().submit(fig, "png"), width=5*inch, height=3*inch,
+                      timeout=float(get_setting("chart_render_timeout", DEFAULT_RENDER_TIMEOUT)))
 
 def pdf_company_overview(data):
     flowables = []
@@ -372,14 +381,70 @@ def pdf_news_sentiment(data):
 
 
 
-def gen_pdf(company_name, overview_data, income_statement_data, balance_sheet_data, cash_flow_data, news_data):
+def _fingerprint(value):
+    """JSON-serialisable form of report inputs, which mix DataFrames, Pydantic models and plain data"""
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict(orient="split")
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {str(k): _fingerprint(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(v) for v in value]
+    return value
+
+def report_key(company_name, *sections) -> str:
+    """Content hash of everything a report is built from"""
+    payload = json.dumps([REPORT_VERSION, company_name, _fingerprint(sections)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def report_path(ticker, key) -> Path:
+    reports_dir = Path(get_pdf_path(REPORTS_DIR))
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    return reports_dir / f"{re.sub(r'[^A-Za-z0-9.-]', '_', ticker)}-{key[:16]}.pdf"
+
+def prune_reports(path: Path):
+    """Remove the ticker's older reports, whose data the report at path supersedes"""
+    ticker = path.name.rsplit("-", 1)[0]
+    stale = re.compile(re.escape(ticker) + r"-[0-9a-f]{16}\.pdf")
+    for other in path.parent.iterdir():
+        if other != path and stale.fullmatch(other.name):
+            other.unlink(missing_ok=True)
+
+def save_report(path: Path, pdf_bytes: bytes):
+    # Written under a unique name and renamed, so concurrent builds never see a partial file
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
     try:
-        # Get the proper PDF path
-        pdf_path = get_pdf_path('final_report.pdf')
-        
-        # Your existing PDF generation code here...
+        tmp_path.write_bytes(pdf_bytes)
+        os.replace(tmp_path, path)
+        prune_reports(path)
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"Could not store PDF report: {str(e)}")
+
+def gen_pdf(company_name, overview_data, income_statement_data, balance_sheet_data, cash_flow_data, news_data, persist=DEFAULT_PERSIST_REPORTS):
+    """Build the report in memory and return its bytes, or None on failure.
+
+    With persist (the default), reports are stored under pdf/reports keyed by
+    ticker and a hash of their data, and an unchanged report is read back
+    instead of rebuilt. Saving a report removes the ticker's older ones.
+    """
+    try:
+        path = None
+        if persist:
+            ticker = (overview_data or {}).get("Symbol") or company_name
+            key = report_key(company_name, overview_data, income_statement_data, balance_sheet_data, cash_flow_data, news_data)
+            path = report_path(ticker, key)
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                # Not built yet, or pruned by a newer report for the ticker
+                pass
+
+        # Each request builds into its own buffer, so concurrent reports never share a file
+        buffer = BytesIO()
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -395,10 +460,15 @@ def gen_pdf(company_name, overview_data, income_statement_data, balance_sheet_da
         # all_flowables.extend(pdf_balance_sheet(balance_sheet_data['metrics'], balance_sheet_data['insights'], balance_sheet_data['chart_data']))
         # all_flowables.extend(pdf_cash_flow(cash_flow_data['metrics'], cash_flow_data['insights'], cash_flow_data['chart_data']))
         # all_flowables.extend(pdf_news_sentiment(news_data))
+        # build() consumes the list
+        charts = [f for f in all_flowables if isinstance(f, ChartImage)]
         doc.build(all_flowables)
         
-        # Return the path to the generated PDF
-        return pdf_path
+        pdf_bytes = buffer.getvalue()
+        # A report with placeholder charts is returned but not kept, so the next request retries them
+        if path is not None and not any(chart.failed for chart in charts):
+            save_report(path, pdf_bytes)
+        return pdf_bytes
         
     except Exception as e:
         print(f"Error generating PDF: {str(e)}")
@@ -410,4 +480,6 @@ if __name__ == "__main__":
     # bal = balance_sheet("AAPL", [True, False, True, False, True])
     # cash = cash_flow("AAPL", [True, True, True, False, False])
     # news = top_news("AAPL", 10)
-    gen_pdf("Apple Inc.", overview_data, inc, None, None, None)
+    pdf_bytes = gen_pdf("Apple Inc.", overview_data, inc, None, None, None)
+    if pdf_bytes:
+        Path(get_pdf_path('final_report.pdf')).write_bytes(pdf_bytes)
@@ -1,7 +1,13 @@
-from pydantic import BaseModel, Field
+import re
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
 
 min_length = 40
 
+# "- ", "* ", "• ", "1. " or "2) " at the start of a list item
+BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
 class IncomeStatementInsights(BaseModel):
     revenue_health: str = Field(..., description=f"Must be more than {min_length} words. Insight into the company's total revenue, providing a perspective on the health of the primary business activity.")
     operational_efficiency: str = Field(..., description=f"Must be more than {min_length} words. Analysis of the company's operating expenses in relation to its revenue, offering a view into the firm's operational efficiency.")
@@ -47,3 +53,26 @@ class CorporateGovernanceSocialResponsibility(BaseModel):
 class InnovationRnD(BaseModel):
     r_and_d_activities: str = Field(..., description="Overview of the company's focus on research and development, major achievements, or breakthroughs.")
     innovation_focus: str = Field(..., description="Mention of new technologies, patents, or areas of research the company is diving into.")
+
+
+class DocumentAnswer(BaseModel):
+    key_findings: List[str] = Field(..., description="Three to five main points, one sentence each.")
+    detailed_analysis: str = Field(..., description="Detailed analysis broken down into clear paragraphs.")
+    summary: str = Field(..., description="A brief conclusion of the findings.")
+
+    @field_validator("key_findings", mode="before")
+    @classmethod
+    def split_findings(cls, value):
+        # Models often return the findings as one bulleted string
+        if isinstance(value, str):
+            value = [BULLET.sub("", line).strip() for line in value.splitlines()]
+        if isinstance(value, list):
+            return [str(item) for item in value if str(item).strip()]
+        return value
+
+    @field_validator("detailed_analysis", "summary", mode="before")
+    @classmethod
+    def join_paragraphs(cls, value):
+        if isinstance(value, list):
+            return "\n\n".join(str(item) for item in value)
+        return value
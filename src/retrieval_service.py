@@ -0,0 +1,265 @@
+"""Long-lived retrieval service keeping the embedding model and indexes hot.
+
+Queries submitted concurrently (e.g. from several Streamlit sessions) are
+collected for up to ``max_wait_ms`` and answered with a single encode call
+and one FAISS search per index. For multi-process deployments the service
+can also be run as a small local socket server:
+
+    python -m src.retrieval_service --port 8765
+
+and reached with ``get_retrieval_service("localhost:8765")``. Index paths
+are resolved relative to the server's working directory.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.embeddings import DEFAULT_MODEL, get_embedding_model
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+# Latency percentiles and QPS are computed over this many recent queries
+STATS_WINDOW = 1000
+# How long a first load waits for a save in progress to finish
+SAVE_WAIT_SECONDS = 10.0
+SAVE_POLL_SECONDS = 0.05
+
+
+@dataclass
+class _Request:
+    query: str
+    k: int
+    path: str
+    future: Future = field(default_factory=Future)
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class RetrievalStats:
+    """Rolling query latency, throughput and batching statistics"""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.batches = 0
+        self.errors = 0
+        self._submitted = deque(maxlen=window)
+        self._last_finished = 0.0
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+
+    def record(self, submitted: List[float], errors: int = 0) -> None:
+        """Record a finished batch from the submission times of its queries"""
+        now = time.perf_counter()
+        with self._lock:
+            self.queries += len(submitted)
+            self.batches += 1
+            self.errors += errors
+            self._submitted.extend(submitted)
+            self._latencies.extend(now - t for t in submitted)
+            self._batch_sizes.append(len(submitted))
+            self._last_finished = now
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            span = self._last_finished - min(self._submitted) if self._submitted else 0.0
+            return {
+                "queries": self.queries,
+                "batches": self.batches,
+                "errors": self.errors,
+                "qps": len(self._submitted) / span if span > 0 else 0.0,
+                "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+                "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            }
+
+
+class RetrievalService:
+    """In-process micro-batching search over saved VectorDB indexes"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.model = get_embedding_model(model_name)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats_tracker = RetrievalStats()
+        # Index path -> (modification time, loaded VectorDB)
+        self._databases: Dict[str, Tuple[float, object]] = {}
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="retrieval-service", daemon=True)
+        self._worker.start()
+
+    def submit(self, query: str, k: int = 5, path: str = "vector_db") -> Future:
+        request = _Request(query, k, path)
+        self._queue.put(request)
+        return request.future
+
+    def search(self, query: str, k: int = 5, path: str = "vector_db", timeout: Optional[float] = None) -> List[str]:
+        return self.submit(query, k, path).result(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        return self.stats_tracker.snapshot()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[_Request]) -> None:
+        errors = 0
+        try:
+            embeddings = np.asarray(self.model.encode([r.query for r in batch]), dtype='float32')
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            errors = len(batch)
+        else:
+            by_path = defaultdict(list)
+            for position, request in enumerate(batch):
+                by_path[request.path].append(position)
+
+            for path, positions in by_path.items():
+                try:
+                    results = self._database(path).search_embeddings(embeddings[positions], max(batch[p].k for p in positions))
+                except Exception as e:
+                    for p in positions:
+                        batch[p].future.set_exception(e)
+                    errors += len(positions)
+                    continue
+                for p, texts in zip(positions, results):
+                    batch[p].future.set_result(texts[:batch[p].k])
+
+        self.stats_tracker.record([r.submitted for r in batch], errors)
+
+    def _database(self, path: str):
+        """Load an index once, reloading only when a new save of it has completed"""
+        # Imported here since src.utils delegates search_vector_db to this module
+        from src.utils import VectorDB
+
+        index_file = os.path.join(path, "index.faiss")
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(f"No vector database at {path}")
+        deadline = time.perf_counter() + SAVE_WAIT_SECONDS
+        while True:
+            version = VectorDB.saved_version(path)
+            cached = self._databases.get(path)
+            # While a save is in progress, keep serving the last complete one
+            if cached is not None and (version is None or cached[0] == version):
+                return cached[1]
+            if version is not None:
+                db = VectorDB(self.model_name)
+                db.load(path)
+                # A save that started during the load may have replaced files already read
+                if VectorDB.saved_version(path) == version:
+                    self._databases[path] = (version, db)
+                    return db
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Vector database at {path} is still being saved")
+            time.sleep(SAVE_POLL_SECONDS)
+
+
+class RetrievalClient:
+    """Client for a retrieval service running as a socket server"""
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self.timeout = timeout
+
+    def _call(self, payload: Dict) -> Union[List[str], Dict[str, float]]:
+        with socket.create_connection(self.address, timeout=self.timeout) as conn:
+            conn.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+            response = json.loads(conn.makefile("r", encoding="utf-8").readline())
+        if "error" in response:
+            raise RuntimeError(f"Retrieval service error: {response['error']}")
+        return response["result"]
+
+    def search(self, query: str, k: int = 5, path: str = "vector_db") -> List[str]:
+        return self._call({"op": "search", "query": query, "k": k, "path": path})
+
+    def stats(self) -> Dict[str, float]:
+        return self._call({"op": "stats"})
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON response per line"""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("op") == "stats":
+                    result = self.server.service.stats()
+                else:
+                    result = self.server.service.search(request["query"], int(request.get("k", 5)), request.get("path", "vector_db"))
+                response = {"result": result}
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class RetrievalServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], service: RetrievalService):
+        super().__init__(address, _RequestHandler)
+        self.service = service
+
+
+_service: Optional[RetrievalService] = None
+_clients: Dict[str, RetrievalClient] = {}
+_service_lock = threading.Lock()
+
+
+def get_retrieval_service(address: Optional[str] = None) -> Union[RetrievalService, RetrievalClient]:
+    """Process-wide retrieval service, or a client for a remote one at host:port"""
+    global _service
+    with _service_lock:
+        if address:
+            if address not in _clients:
+                _clients[address] = RetrievalClient(address)
+            return _clients[address]
+        if _service is None:
+            _service = RetrievalService()
+        return _service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    service = RetrievalService(args.model, args.max_batch_size, args.max_wait_ms)
+    with RetrievalServer((args.host, args.port), service) as server:
+        print(f"Retrieval service listening on {args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+def get_setting(name: str, default):
+    """Value from Streamlit secrets, or default when there is no secrets file
+    (e.g. when run from the benchmarks, the retrieval server or pdf_gen as a script)"""
+    try:
+        import streamlit as st
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.groq_client import get_completion
+from src.token_budget import estimate_tokens, fit_to_budget, truncate_to_tokens
+
+# Filing text sent to one map completion
+MAP_INPUT_BUDGET = 3000
+MAP_SUMMARY_TOKENS = 200
+SECTION_SUMMARY_TOKENS = 350
+# Summaries included in an answer prompt, next to the retrieved chunks
+SUMMARY_CONTEXT_BUDGET = 1500
+DEFAULT_MAX_WORKERS = 4
+
+SUMMARIES_FILE = "summaries"
+# Bump when the prompts change so cached summaries are rebuilt
+SUMMARIZER_VERSION = 1
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def section_pieces(processor) -> List[Tuple[str, str, str]]:
+    """Split every section's chunks into (section key, title, text) pieces that fit one map call"""
+    pieces = []
+    for key, section in processor.sections.items():
+        current, used = [], 0
+        for chunk in processor.chunks[section["start"]:section["end"]]:
+            cost = estimate_tokens(chunk)
+            if current and used + cost > MAP_INPUT_BUDGET:
+                pieces.append((key, section["title"], "\n".join(current)))
+                current, used = [], 0
+            current.append(chunk)
+            used += cost
+        if current:
+            pieces.append((key, section["title"], truncate_to_tokens("\n".join(current), MAP_INPUT_BUDGET)))
+    return pieces
+
+
+def summarize_text(text: str, title: str, max_tokens: int) -> str:
+    """Summarise filing text, falling back to truncation if the completion fails"""
+    prompt = f"""
+    Summarise this excerpt from the "{title}" section of a company's annual report.
+    Keep every reported figure, growth rate, segment, risk and forward-looking statement; drop boilerplate.
+    Answer with the summary only, in at most {max_tokens * 3 // 4} words.
+
+    Excerpt:
+    {text}
+    """
+    try:
+        return truncate_to_tokens(get_completion(prompt).strip(), max_tokens)
+    except Exception:
+        return truncate_to_tokens(text, max_tokens)
+
+
+def _run_parallel(jobs: List[Tuple], max_workers: int, progress: Optional[ProgressCallback], offset: int, total: int) -> List[str]:
+    results = [""] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(summarize_text, *job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(offset + done, total)
+    return results
+
+
+def build_summaries(processor, max_workers: int = DEFAULT_MAX_WORKERS, progress: Optional[ProgressCallback] = None) -> List[Dict]:
+    """Map: summarise every piece of every section in parallel. Reduce: merge each section's pieces.
+
+    ``progress`` is called from the calling thread with (completed, total) calls.
+    """
+    pieces = section_pieces(processor)
+    by_section: Dict[str, List[int]] = {}
+    for i, (key, _, _) in enumerate(pieces):
+        by_section.setdefault(key, []).append(i)
+    multi_piece = [key for key, positions in by_section.items() if len(positions) > 1]
+    total = len(pieces) + len(multi_piece)
+
+    piece_summaries = _run_parallel([(text, title, MAP_SUMMARY_TOKENS) for _, title, text in pieces],
+                                    max_workers, progress, 0, total)
+
+    reduce_jobs = [("\n".join(piece_summaries[i] for i in by_section[key]), processor.sections[key]["title"], SECTION_SUMMARY_TOKENS)
+                   for key in multi_piece]
+    reduced = dict(zip(multi_piece, _run_parallel(reduce_jobs, max_workers, progress, len(pieces), total)))
+
+    return [
+        {"section": key, "title": processor.sections[key]["title"],
+         "summary": reduced.get(key) or piece_summaries[positions[0]]}
+        for key, positions in by_section.items()
+    ]
+
+
+def load_or_build_summaries(processor, max_workers: int = DEFAULT_MAX_WORKERS,
+                            progress: Optional[ProgressCallback] = None) -> List[Dict]:
+    """Section summaries cached next to the processor's index, built on first use"""
+    if processor.cache_key:
+        cached = processor.cache.load_json(processor.cache_key, SUMMARIES_FILE)
+        if cached and cached.get("version") == SUMMARIZER_VERSION:
+            return cached["sections"]
+
+    summaries = build_summaries(processor, max_workers, progress)
+    if processor.cache_key:
+        processor.cache.save_json(processor.cache_key, SUMMARIES_FILE, {"version": SUMMARIZER_VERSION, "sections": summaries})
+    return summaries
+
+
+def summary_context(summaries: List[Dict], preferred_sections: Optional[List[str]] = None,
+                    max_tokens: int = SUMMARY_CONTEXT_BUDGET) -> List[str]:
+    """Section summaries for a prompt, preferred sections first, then in document order, within budget"""
+    preferred = set(preferred_sections or ())
+    ordered = [s for s in summaries if s["section"] in preferred] + [s for s in summaries if s["section"] not in preferred]
+    texts, _ = fit_to_budget([f"[{s['title']}] {s['summary']}" for s in ordered], max_tokens)
+    return texts
@@ -0,0 +1,159 @@
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from src.summarizer import DEFAULT_MAX_WORKERS, MAP_INPUT_BUDGET, ProgressCallback, summarize_text
+from src.token_budget import truncate_to_tokens
+from src.vector_index import search_params
+
+# Children per tree node
+CLUSTER_SIZE = 8
+NODE_SUMMARY_TOKENS = 250
+KMEANS_ITERATIONS = 20
+# A coarser level wins routing when its best match is within this fraction of the overall best
+ROUTING_MARGIN = 0.05
+ROOT_TITLE = "Document Overview"
+# Title of clusters below the root whose chunks lie outside every section
+CLUSTER_TITLE = "Document Excerpts"
+
+
+class SummaryTree:
+    """Multi-granularity index over a document: chunks, cluster summaries, ..., a root summary.
+
+    Level 0 is the chunks themselves. Every higher level clusters the nodes
+    below it with k-means and summarises each cluster. Summary embeddings are
+    appended to the document's FAISS index after the chunks, so every level
+    owns a contiguous ID range and is searched with an ID range selector.
+    """
+
+    def __init__(self, levels: List[Dict[str, int]], nodes: Dict[int, Dict]):
+        # Level -> {"start", "end"} ID range; level 0 is the chunks
+        self.levels = levels
+        # Summary node ID -> {"text", "children"}
+        self.nodes = nodes
+
+    def to_dict(self) -> Dict:
+        return {"levels": self.levels, "nodes": {str(i): node for i, node in self.nodes.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SummaryTree":
+        return cls(data["levels"], {int(i): node for i, node in data["nodes"].items()})
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels)
+
+    def text(self, node_id: int, chunks: List[str]) -> str:
+        return chunks[node_id] if node_id < self.levels[0]["end"] else self.nodes[node_id]["text"]
+
+    def _search_range(self, index: faiss.Index, query_vectors: np.ndarray, k: int, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        params = search_params(index, faiss.IDSelectorRange(start, end))
+        return index.search(query_vectors, min(k, end - start), params=params)
+
+    def route(self, index: faiss.Index, query_vector: np.ndarray) -> int:
+        """Pick the coarsest level whose best match is about as close as the best match anywhere"""
+        best = []
+        for level in self.levels:
+            distances, indices = self._search_range(index, query_vector[None, :], 1, level["start"], level["end"])
+            best.append(float(distances[0][0]) if indices[0][0] >= 0 else math.inf)
+        threshold = min(best) * (1 + ROUTING_MARGIN) if min(best) > 0 else min(best)
+        return max(level for level, distance in enumerate(best) if distance <= threshold)
+
+    def search(self, index: faiss.Index, query_vector: np.ndarray, k: int, level: int) -> List[int]:
+        level_range = self.levels[level]
+        _, indices = self._search_range(index, query_vector[None, :], k, level_range["start"], level_range["end"])
+        return [int(i) for i in indices[0] if i >= 0]
+
+    def leaves(self, node_id: int) -> List[int]:
+        """Chunk IDs under a node"""
+        if node_id not in self.nodes:
+            return [node_id]
+        return [leaf for child in self.nodes[node_id]["children"] for leaf in self.leaves(child)]
+
+    def drill_down(self, index: faiss.Index, query_vector: np.ndarray, node_id: int, k: int) -> List[int]:
+        """Best k chunks under a summary node for the query"""
+        leaves = np.array(self.leaves(node_id), dtype='int64')
+        params = search_params(index, faiss.IDSelectorBatch(leaves))
+        _, indices = index.search(query_vector[None, :], min(k, len(leaves)), params=params)
+        return [int(i) for i in indices[0] if i >= 0]
+
+
+def cluster(vectors: np.ndarray, n_clusters: int) -> List[List[int]]:
+    """Group row positions with k-means, dropping empty clusters"""
+    if n_clusters <= 1:
+        return [list(range(len(vectors)))]
+    kmeans = faiss.Kmeans(vectors.shape[1], n_clusters, niter=KMEANS_ITERATIONS, seed=1234)
+    # Documents are small; silence the "please provide at least 39 points per centroid" warning
+    kmeans.cp.min_points_per_centroid = 1
+    kmeans.train(vectors)
+    _, assignment = kmeans.index.search(vectors, 1)
+    groups: Dict[int, List[int]] = {}
+    for position, label in enumerate(assignment[:, 0]):
+        groups.setdefault(int(label), []).append(position)
+    return list(groups.values())
+
+
+def _cluster_title(processor, tree: SummaryTree, members: List[int]) -> str:
+    """Most common section title among the chunks under the cluster's members"""
+    titles = Counter()
+    for chunk_id in (leaf for member in members for leaf in tree.leaves(member)):
+        for section in processor.sections.values():
+            if section["start"] <= chunk_id < section["end"]:
+                titles[section["title"]] += 1
+                break
+    return titles.most_common(1)[0][0] if titles else CLUSTER_TITLE
+
+
+def build_summary_tree(processor, embeddings: np.ndarray, max_workers: int = DEFAULT_MAX_WORKERS,
+                       progress: Optional[ProgressCallback] = None) -> SummaryTree:
+    """Build the tree bottom-up, appending every level's summary embeddings to processor.index.
+
+    ``embeddings`` are the chunk embeddings the index was built from.
+    ``progress`` is called from the calling thread with (summaries done, estimated total).
+    """
+    n_chunks = len(processor.chunks)
+    levels = [{"start": 0, "end": n_chunks}]
+    nodes: Dict[int, Dict] = {}
+    # Filled in as levels are built, so titles can look up the chunks under lower nodes
+    tree = SummaryTree(levels, nodes)
+    level_ids = list(range(n_chunks))
+    level_texts = list(processor.chunks)
+    level_vectors = np.ascontiguousarray(embeddings, dtype='float32')
+
+    estimated_total, done = 0, 0
+    remaining = n_chunks
+    while remaining > 1:
+        remaining = math.ceil(remaining / CLUSTER_SIZE)
+        estimated_total += remaining
+
+    while len(level_ids) > 1:
+        groups = cluster(level_vectors, math.ceil(len(level_ids) / CLUSTER_SIZE))
+        jobs = []
+        for members in groups:
+            text = truncate_to_tokens("\n\n".join(level_texts[m] for m in members), MAP_INPUT_BUDGET)
+            title = _cluster_title(processor, tree, [level_ids[m] for m in members]) if len(groups) > 1 else ROOT_TITLE
+            jobs.append((text, title, NODE_SUMMARY_TOKENS))
+
+        summaries = [""] * len(jobs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(summarize_text, *job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                summaries[futures[future]] = future.result()
+                done += 1
+                if progress:
+                    progress(done, max(estimated_total, done))
+
+        vectors, _ = processor.embedding_cache.encode(processor.model, processor.model_name, summaries)
+        start = processor.index.ntotal
+        processor.index.add(vectors)
+        ids = list(range(start, start + len(summaries)))
+        for node_id, members, summary in zip(ids, groups, summaries):
+            nodes[node_id] = {"text": summary, "children": [level_ids[m] for m in members]}
+        levels.append({"start": start, "end": start + len(summaries)})
+        level_ids, level_texts, level_vectors = ids, summaries, vectors
+
+    return tree
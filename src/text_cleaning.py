@@ -0,0 +1,72 @@
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from src.chunking import ITEM_HEADING
+
+# Headers and footers sit in the first / last few extracted lines of a page
+EDGE_LINES = 3
+# A line is boilerplate when it recurs on this share of pages (and at least MIN_REPEAT_PAGES)
+REPEAT_FRACTION = 0.3
+MIN_REPEAT_PAGES = 3
+
+# "12", "Page 12", "12 of 80", "- 12 -", "F-12"
+PAGE_NUMBER = re.compile(r"^[-–\s]*(page\s+)?([a-z]-)?\d{1,4}(\s+of\s+\d{1,4})?[-–\s]*$", re.IGNORECASE)
+# Table of contents entries with dot leaders: "Risk Factors ........ 12"
+DOT_LEADER_LINE = re.compile(r"\.{4,}\s*(\d{1,4})\s*$")
+# Dot-leader lines a page needs, with ascending page numbers, to count as a contents page;
+# financial tables use dot leaders too, and their rows must be kept
+MIN_CONTENTS_ENTRIES = 3
+DIGITS = re.compile(r"\d+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_line(line: str) -> str:
+    """Key under which repeated lines are matched; digits are masked so running page numbers compare equal"""
+    return WHITESPACE.sub(" ", DIGITS.sub("#", line)).strip().lower()
+
+
+def edge_lines(lines: List[str]) -> List[str]:
+    content = [line for line in lines if line.strip()]
+    return content[:EDGE_LINES] + content[-EDGE_LINES:]
+
+
+def is_contents_page(lines: List[str]) -> bool:
+    numbers = [int(match.group(1)) for match in map(DOT_LEADER_LINE.search, lines) if match]
+    return len(numbers) >= MIN_CONTENTS_ENTRIES and numbers == sorted(numbers)
+
+
+def find_repeated_lines(pages: List[str]) -> set:
+    """Normalized header / footer lines recurring at the top or bottom of many pages"""
+    counts = Counter()
+    for page in pages:
+        counts.update({normalize_line(line) for line in edge_lines(page.splitlines())})
+    threshold = max(MIN_REPEAT_PAGES, REPEAT_FRACTION * len(pages))
+    return {line for line, count in counts.items() if line and count >= threshold}
+
+
+def strip_boilerplate(pages: List[str]) -> Tuple[List[str], Dict[str, int]]:
+    """Drop repeated headers / footers, page numbers and the dot-leader lines of contents pages.
+
+    10-K item headings outside the contents are kept since chunking splits sections on them.
+    Returns the cleaned pages and counts of what was removed.
+    """
+    repeated = find_repeated_lines(pages)
+    stats = {"pages": len(pages), "lines_removed": 0, "chars_removed": 0}
+    cleaned = []
+    for page in pages:
+        lines = page.splitlines()
+        edges = set(edge_lines(lines))
+        contents = is_contents_page(lines)
+        kept = []
+        for line in lines:
+            drop = contents and DOT_LEADER_LINE.search(line) or line in edges and not ITEM_HEADING.match(line) and (
+                normalize_line(line) in repeated or PAGE_NUMBER.match(line.strip())
+            )
+            if drop:
+                stats["lines_removed"] += 1
+                stats["chars_removed"] += len(line)
+            else:
+                kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned, stats
@@ -0,0 +1,44 @@
+from typing import List, Tuple
+
+# Rough tokens-per-character ratio for English prose with the Llama tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate, good enough for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut text to roughly max_tokens, preferring a whitespace boundary.
+
+    With keep_end the most recent (trailing) part of the text is kept.
+    """
+    max_chars = max(max_tokens, 0) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        cut = text.find(" ", len(text) - max_chars)
+        return text[cut + 1 if cut >= 0 else len(text) - max_chars:]
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
+
+
+def fit_to_budget(texts: List[str], max_tokens: int) -> Tuple[List[str], int]:
+    """Keep texts in order while they fit in the budget; return them and the tokens used.
+
+    A text that does not fit is skipped so smaller ones after it can still be
+    used, except the first one, which is truncated rather than dropped.
+    """
+    selected = []
+    used = 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if used + cost > max_tokens:
+            if selected or max_tokens <= 1:
+                continue
+            text = truncate_to_tokens(text, max_tokens - 1)
+            cost = estimate_tokens(text)
+        selected.append(text)
+        used += cost
+    return selected, used
@@ -38,10 +38,24 @@ MODEL_ID = 'GPT-4'
 MODEL_VERSION_ID = '4aa760933afa4a33a0e5b4652cfa92fa'
 
 from groq import Groq
-from sentence_transformers import SentenceTransformer
+from src.embeddings import get_embedding_model
 import numpy as np
 import faiss
 from src.groq_client import get_completion
+from src.vector_index import (TOMBSTONE_COMPACT_RATIO, add_vectors_with_ids, exclude_ids, reconstruct_all, remove_vectors,
+                              search_params, supports_removal)
+from src.chunk_store import ChunkStore, text_id
+from src.retrieval_service import get_retrieval_service
+from src.embedding_cache import EmbeddingCache
+from collections import Counter
+
+# Map flat index codes straight from disk (zero-copy) where FAISS supports it
+MMAP_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+DEFAULT_DOCUMENT = "default"
+# Written last by VectorDB.save, marking the files before it as one complete save
+MANIFEST_FILE = "manifest.json"
+VECTOR_DB_FILES = ("index.faiss", "ids.npy", "offsets.npy", "texts.bin", "texts.json", "tombstones.npy", "documents.json")
 
 import os
 from pathlib import Path
@@ -69,53 +83,214 @@ def get_model(model_name, api_key):
     return client
 
 class VectorDB:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
+    """FAISS vector store with stable, content-derived chunk IDs.
+
+    Chunks are grouped by document so a single filing can be deleted or
+    upserted without rebuilding the index, and identical chunk text is
+    stored and embedded once however many documents contain it.
+    """
+    def __init__(self, model_name='all-MiniLM-L6-v2', index_backend='auto', compression=None, embedding_cache=None):
+        self.model = get_embedding_model(model_name)
+        self.model_name = model_name
+        self.index_backend = index_backend
+        self.compression = compression
         self.index = None
-        self.texts = []
-        
-    def add_texts(self, texts):
-        self.texts.extend(texts)
-        embeddings = self.model.encode(texts)
+        self.index_path = None
+        self.read_only = False
+        # Chunk ID -> text; a memory-mapped ChunkStore after load()
+        self.texts = {}
+        # Document ID -> chunk IDs; loaded lazily after load()
+        self.documents = {}
+        self.refcounts = Counter()
+        # Removed chunk IDs still stored in an index without in-place removal (HNSW), skipped at search time
+        self.tombstones = set()
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        # Hit statistics of the last add_texts call
+        self.embedding_stats = {}
         
-        # Initialize FAISS index if not exists
-        if self.index is None:
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-        
-        # Add vectors to the index
-        self.index.add(np.array(embeddings).astype('float32'))
+    def _make_writable(self):
+        """Materialise a loaded (memory-mapped) database before mutating it"""
+        if self.read_only:
+            self.index = faiss.read_index(self.index_path)
+            self.read_only = False
+        if isinstance(self.texts, ChunkStore):
+            self.texts = dict(self.texts.items())
+        if isinstance(self.texts, list):
+            self._migrate_positional_ids()
+        if self.documents is None:
+            with open(os.path.join(os.path.dirname(self.index_path), "documents.json"), 'r') as f:
+                self.documents = {doc_id: ids for doc_id, ids in json.load(f).items()}
+            self.refcounts = Counter(i for ids in self.documents.values() for i in ids)
+
+    def _migrate_positional_ids(self):
+        # Databases saved before stable IDs used list positions as FAISS IDs
+        texts = self.texts
+        vectors = None
+        if self.index is not None:
+            vectors = reconstruct_all(self.index)
+        ids = [text_id(t) for t in texts]
+        unique = dict(zip(ids, range(len(texts))))
+        self.texts = {i: texts[pos] for i, pos in unique.items()}
+        self.index = None
+        if vectors is not None and unique:
+            self.index = add_vectors_with_ids(None, vectors[list(unique.values())], np.array(list(unique)), self.index_backend, self.compression)
+        self.documents = {DEFAULT_DOCUMENT: list(unique)}
+        self.refcounts = Counter(unique.keys())
+
+    def add_texts(self, texts, doc_id=DEFAULT_DOCUMENT):
+        """Add chunks to a document; only text not already in the database is embedded"""
+        self._make_writable()
+        ids = [text_id(t) for t in texts]
+        document = self.documents.setdefault(doc_id, [])
+        in_document = set(document)
+
+        new_texts = {}
+        for chunk_id, text in zip(ids, texts):
+            if chunk_id in self.tombstones:
+                # Its vector is still in the index
+                self.tombstones.discard(chunk_id)
+                self.texts[chunk_id] = text
+            elif chunk_id not in self.texts:
+                new_texts[chunk_id] = text
+            if chunk_id not in in_document:
+                document.append(chunk_id)
+                in_document.add(chunk_id)
+                self.refcounts[chunk_id] += 1
+
+        if new_texts:
+            embeddings, self.embedding_stats = self.embedding_cache.encode(self.model, self.model_name, list(new_texts.values()))
+            # Create, train or upgrade the FAISS index as the corpus grows
+            self.index = add_vectors_with_ids(self.index, embeddings,
+                                              np.array(list(new_texts), dtype='int64'), self.index_backend, self.compression)
+            self.texts.update(new_texts)
+        return ids
+
+    def _release(self, chunk_ids, keep=()):
+        """Drop references to chunks and remove the ones no document uses any more"""
+        orphaned = []
+        for chunk_id in chunk_ids:
+            self.refcounts[chunk_id] -= 1
+            if self.refcounts[chunk_id] <= 0 and chunk_id not in keep:
+                del self.refcounts[chunk_id]
+                orphaned.append(chunk_id)
+        if not orphaned:
+            return
+        for chunk_id in orphaned:
+            self.texts.pop(chunk_id, None)
+        if supports_removal(self.index):
+            self.index = remove_vectors(self.index, np.array(orphaned, dtype='int64'), self.compression)
+            return
+        self.tombstones.update(orphaned)
+        if len(self.tombstones) > TOMBSTONE_COMPACT_RATIO * self.index.ntotal:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the index without tombstoned vectors.
+
+        Vectors come from the embedding cache rather than the index, so
+        compressed indexes are not quantised twice.
+        """
+        ids = sorted(self.texts)
+        self.index = None
+        if ids:
+            embeddings, _ = self.embedding_cache.encode(self.model, self.model_name, [self.texts[i] for i in ids])
+            self.index = add_vectors_with_ids(None, embeddings, np.array(ids, dtype='int64'), self.index_backend, self.compression)
+        self.tombstones = set()
+
+    def delete_document(self, doc_id):
+        """Remove a document and every chunk no other document shares"""
+        self._make_writable()
+        self._release(self.documents.pop(doc_id, []))
+
+    def upsert_document(self, doc_id, texts):
+        """Replace a document's chunks, embedding only text that changed"""
+        self._make_writable()
+        keep = {text_id(t) for t in texts}
+        self._release(self.documents.pop(doc_id, []), keep)
+        return self.add_texts(texts, doc_id)
+
+    def _text(self, chunk_id):
+        if isinstance(self.texts, ChunkStore):
+            return self.texts.get_by_id(chunk_id)
+        return self.texts[chunk_id]
     
     def similarity_search(self, query, k=5):
         # Get the query embedding
         query_embedding = self.model.encode([query])
+        return self.search_embeddings(query_embedding, k)[0]
+
+    def search_embeddings(self, query_embeddings, k=5):
+        """Search several pre-computed query embeddings in one FAISS call"""
+        params = None
+        if self.tombstones:
+            params = search_params(self.index, exclude_ids(np.fromiter(self.tombstones, dtype='int64')))
+        distances, indices = self.index.search(np.array(query_embeddings).astype('float32'), k, params=params)
         
-        # Search in the index
-        distances, indices = self.index.search(np.array(query_embedding).astype('float32'), k)
-        
-        # Return the most similar texts
-        return [self.texts[i] for i in indices[0]]
+        # Return the most similar texts; only these are read from the chunk store
+        return [[self._text(int(i)) for i in row if i >= 0] for row in indices]
     
     def save(self, path):
-        faiss.write_index(self.index, f"{path}/index.faiss")
-        with open(f"{path}/texts.json", 'w') as f:
-            json.dump(self.texts, f)
+        self._make_writable()
+        # Write next to the live files and swap them in, since they may be memory-mapped
+        faiss.write_index(self.index, f"{path}/index.faiss.tmp")
+        os.replace(f"{path}/index.faiss.tmp", f"{path}/index.faiss")
+        ids = sorted(self.texts)
+        ChunkStore.write(path, (self.texts[i] for i in ids), ids)
+        with open(f"{path}/tombstones.npy.tmp", 'wb') as f:
+            np.save(f, np.array(sorted(self.tombstones), dtype='int64'))
+        os.replace(f"{path}/tombstones.npy.tmp", f"{path}/tombstones.npy")
+        with open(f"{path}/documents.json.tmp", 'w') as f:
+            json.dump(self.documents, f)
+        os.replace(f"{path}/documents.json.tmp", f"{path}/documents.json")
+        with open(f"{path}/{MANIFEST_FILE}.tmp", 'w') as f:
+            json.dump({"saved_at": time.time()}, f)
+        os.replace(f"{path}/{MANIFEST_FILE}.tmp", f"{path}/{MANIFEST_FILE}")
+
+    @staticmethod
+    def saved_version(path):
+        """Modification time identifying the last complete save, or None while a save is in progress"""
+        mtimes = {name: os.path.getmtime(f"{path}/{name}") for name in VECTOR_DB_FILES if os.path.exists(f"{path}/{name}")}
+        if not mtimes:
+            return None
+        if os.path.exists(f"{path}/{MANIFEST_FILE}"):
+            version = os.path.getmtime(f"{path}/{MANIFEST_FILE}")
+            return version if max(mtimes.values()) <= version else None
+        # Saved before manifests: texts are written after the index
+        texts = mtimes.get("offsets.npy", mtimes.get("texts.json", 0))
+        return max(mtimes.values()) if texts >= mtimes.get("index.faiss", 0) else None
     
-    def load(self, path):
-        self.index = faiss.read_index(f"{path}/index.faiss")
-        with open(f"{path}/texts.json", 'r') as f:
-            self.texts = json.load(f)
-
-def create_vector_db(splitted_text):
+    def load(self, path, mmap=True):
+        """Open a saved database; with mmap the index and texts are mapped, not read"""
+        self.index_path = f"{path}/index.faiss"
+        if mmap:
+            self.index = faiss.read_index(self.index_path, MMAP_IO_FLAGS)
+            self.read_only = True
+        else:
+            self.index = faiss.read_index(self.index_path)
+
+        if ChunkStore.exists(path):
+            self.texts = ChunkStore(path)
+            # Databases saved before stable IDs have positional IDs
+            if self.texts.ids is None:
+                self.texts = list(self.texts)
+        else:
+            # Databases saved before the chunk store was introduced
+            with open(f"{path}/texts.json", 'r') as f:
+                self.texts = json.load(f)
+        self.documents = None if os.path.exists(f"{path}/documents.json") else {}
+        # Databases saved before tombstones have none
+        self.tombstones = set(np.load(f"{path}/tombstones.npy").tolist()) if os.path.exists(f"{path}/tombstones.npy") else set()
+
+def create_vector_db(splitted_text, path="vector_db"):
     db = VectorDB()
     db.add_texts(splitted_text)
-    db.save("vector_db")
+    ensure_directory_exists(path)
+    db.save(path)
     return db
 
-def search_vector_db(query, k=5):
-    db = VectorDB()
-    db.load("vector_db")
-    return db.similarity_search(query, k)
+def search_vector_db(query, k=5, path="vector_db"):
+    # The resident service keeps the model and index loaded between calls
+    return get_retrieval_service(st.secrets.get("retrieval_service_address")).search(query, k, path)
 
 def process_pdf(pdfs):
     docs = []
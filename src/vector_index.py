@@ -0,0 +1,249 @@
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# Corpus size thresholds used by the "auto" backend
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 1_000_000
+
+BACKENDS = ("auto", "flat", "ivf", "hnsw")
+# Vector storage: exact float32 (None), scalar quantised or product quantised
+COMPRESSIONS = (None, "fp16", "sq8", "pq")
+PQ_MIN_NBITS = 4
+
+# Search-time defaults, tuned with benchmarks/index_benchmark.py
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+# Share of an index's vectors that may be tombstoned before it is compacted
+TOMBSTONE_COMPACT_RATIO = 0.2
+# IndexIDMap2 stores each ID in its id_map and in an unordered_map node
+ID_MAP2_ENTRY_BYTES = 40
+
+
+def choose_backend(n_vectors: int) -> str:
+    """Pick an index type for a corpus of the given size"""
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf"
+
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """Return the underlying index of an ID-mapped index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_kind(index: faiss.Index) -> str:
+    """Return the backend name of an existing index"""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        # A single inverted list is the flat backend's PQ storage (see create_index)
+        return "ivf" if index.nlist > 1 else "flat"
+    return "flat"
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Whether remove_ids works in place; HNSW graphs can only be rebuilt"""
+    return index_kind(index) != "hnsw"
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """All stored vectors, in insertion order"""
+    inner = unwrap(index)
+    if not isinstance(inner, faiss.IndexIVF) or inner.direct_map.type != faiss.DirectMap.NoMap:
+        return inner.reconstruct_n(0, index.ntotal)
+    # Temporarily, since an array direct map blocks remove_ids
+    inner.make_direct_map()
+    try:
+        return inner.reconstruct_n(0, index.ntotal)
+    finally:
+        inner.make_direct_map(False)
+
+
+def ivf_nlist(n_vectors: int) -> int:
+    """Number of IVF cells for a corpus, keeping ~39 training points per cell"""
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // 39 or 1))
+
+
+def pq_nbits(n_vectors: int) -> int:
+    """Bits per PQ code, keeping ~39 training vectors per codebook centroid"""
+    return max(PQ_MIN_NBITS, min(8, int(math.log2(max(n_vectors // 39, 1)))))
+
+
+def pq_subquantizers(dimension: int) -> int:
+    """Number of PQ sub-vectors, aiming for ~8 dimensions each"""
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def storage_spec(dimension: int, n_vectors: int, compression: Optional[str]) -> str:
+    """index_factory description of how vectors are stored"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {COMPRESSIONS}")
+    if compression == "pq" and n_vectors < 2 ** PQ_MIN_NBITS:
+        # Too few vectors to train PQ codebooks; 8-bit scalar quantisation needs no such minimum
+        compression = "sq8"
+    if compression == "pq":
+        return f"PQ{pq_subquantizers(dimension)}x{pq_nbits(n_vectors)}"
+    return {None: "Flat", "fp16": "SQfp16", "sq8": "SQ8"}[compression]
+
+
+def create_index(dimension: int, backend: str = "auto", n_vectors: int = 0, compression: Optional[str] = None) -> faiss.Index:
+    """Create an empty index of the requested backend and vector compression"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {BACKENDS}")
+    if backend == "auto":
+        backend = choose_backend(n_vectors)
+
+    storage = storage_spec(dimension, n_vectors, compression)
+    if backend == "flat":
+        if storage.startswith("PQ"):
+            # A bare IndexPQ rejects SearchParameters, so ID selectors need it behind one inverted list
+            index = faiss.index_factory(dimension, f"IVF1,{storage}")
+            faiss.downcast_index(index).nprobe = 1
+            return index
+        return faiss.index_factory(dimension, storage)
+    if backend == "hnsw":
+        index = faiss.index_factory(dimension, f"HNSW{HNSW_M},{storage}")
+        faiss.downcast_index(index).hnsw.efSearch = DEFAULT_EF_SEARCH
+        return index
+
+    index = faiss.index_factory(dimension, f"IVF{ivf_nlist(n_vectors)},{storage}")
+    faiss.downcast_index(index).nprobe = DEFAULT_NPROBE
+    return index
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Approximate resident size of the index's codes and structures.
+
+    Computed from ntotal and the code size instead of serialising, which
+    would briefly copy the whole index.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        # int64 ID per vector, plus IndexIDMap2's reverse hash map
+        id_bytes = index.ntotal * (ID_MAP2_ENTRY_BYTES if isinstance(index, faiss.IndexIDMap2) else 8)
+        return id_bytes + index_memory_bytes(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        graph = hnsw.neighbors.size() * 4 + hnsw.levels.size() * 4 + hnsw.offsets.size() * 8
+        return graph + index_memory_bytes(index.storage)
+
+    size = 0
+    if isinstance(index, faiss.IndexIVF):
+        # Inverted lists hold each vector's code and int64 ID; the coarse quantiser is a flat index
+        size += index.ntotal * (index.code_size + 8) + index_memory_bytes(index.quantizer)
+    else:
+        size += index.ntotal * index.code_size
+    # Trained codebooks and scalar quantiser ranges
+    if hasattr(index, "pq"):
+        size += index.pq.centroids.size() * 4
+    if hasattr(index, "precomputed_table"):
+        size += index.precomputed_table.size() * 4
+    if hasattr(index, "sq"):
+        size += index.sq.trained.size() * 4
+    return int(size)
+
+
+def train_if_needed(index: faiss.Index, embeddings: np.ndarray) -> None:
+    """Train the index on the given vectors unless it is already trained"""
+    if not index.is_trained:
+        index.train(embeddings)
+
+
+def build_index(embeddings: np.ndarray, backend: str = "auto", compression: Optional[str] = None) -> faiss.Index:
+    """Create, train and fill an index for a batch of embeddings"""
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    index = create_index(embeddings.shape[1], backend, len(embeddings), compression)
+    train_if_needed(index, embeddings)
+    index.add(embeddings)
+    return index
+
+
+def add_vectors_with_ids(index: Optional[faiss.Index], embeddings: np.ndarray, ids: np.ndarray, backend: str = "auto",
+                         compression: Optional[str] = None) -> faiss.Index:
+    """Add embeddings under explicit IDs to an IndexIDMap2, creating it on first use"""
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    ids = np.ascontiguousarray(ids, dtype='int64')
+    if index is None:
+        inner = create_index(embeddings.shape[1], backend, len(embeddings), compression)
+        train_if_needed(inner, embeddings)
+        index = faiss.IndexIDMap2(inner)
+        index.add_with_ids(embeddings, ids)
+        return index
+
+    total = index.ntotal + len(embeddings)
+    if backend == "auto" and index_kind(index) == "flat" and choose_backend(total) != "flat":
+        existing = reconstruct_all(index)
+        existing_ids = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+        return add_vectors_with_ids(None, np.vstack([existing, embeddings]), np.concatenate([existing_ids, ids]), "auto", compression)
+
+    train_if_needed(index, embeddings)
+    index.add_with_ids(embeddings, ids)
+    return index
+
+
+def remove_vectors(index: faiss.Index, ids: np.ndarray, compression: Optional[str] = None) -> Optional[faiss.Index]:
+    """Remove IDs from an IndexIDMap2, rebuilding it for backends without removal (HNSW)"""
+    ids = np.ascontiguousarray(ids, dtype='int64')
+    try:
+        index.remove_ids(faiss.IDSelectorBatch(ids))
+        return index
+    except RuntimeError:
+        id_map = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+        keep = ~np.isin(id_map, ids)
+        vectors = reconstruct_all(index)[keep]
+        if not len(vectors):
+            return None
+        return add_vectors_with_ids(None, vectors, id_map[keep], index_kind(index), compression)
+
+
+def search_params(index: faiss.Index, selector: Optional[faiss.IDSelector] = None) -> faiss.SearchParameters:
+    """Build search parameters restricting results to ``selector``.
+
+    Parameters passed to ``search`` override the values set on the index, so
+    the current nprobe / efSearch are carried over.
+    """
+    kind = index_kind(index)
+    inner = unwrap(index)
+    # By type rather than kind: flat PQ indexes are IVF too and only accept IVF parameters
+    if isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=inner.nprobe)
+    elif kind == "hnsw":
+        params = faiss.SearchParametersHNSW(efSearch=inner.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def exclude_ids(ids: np.ndarray) -> faiss.IDSelector:
+    """Selector rejecting ``ids``, e.g. tombstoned vectors still stored in an HNSW index"""
+    batch = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype='int64'))
+    selector = faiss.IDSelectorNot(batch)
+    # IDSelectorNot does not own the selector it wraps
+    selector.inner = batch
+    return selector
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """Adjust the speed/recall trade-off of an approximate index"""
+    kind = index_kind(index)
+    index = unwrap(index)
+    if kind == "ivf" and nprobe is not None:
+        index.nprobe = nprobe
+    elif kind == "hnsw" and ef_search is not None:
+        index.hnsw.efSearch = ef_search
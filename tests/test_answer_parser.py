@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import json
+
+from src.answer_parser import parse_answer
+
+ANSWER = {
+    "key_findings": ["Net sales grew 8%", "Services margin widened"],
+    "detailed_analysis": "Growth came from iPhone and Services.",
+    "summary": "A strong year.",
+}
+
+
+def test_valid_json():
+    answer, status = parse_answer(json.dumps(ANSWER))
+    assert status == "valid"
+    assert answer.key_findings == ANSWER["key_findings"]
+
+
+def test_code_fence_and_prose_around_object():
+    raw = "Here is the analysis:\n```json\n" + json.dumps(ANSWER) + "\n```"
+    answer, status = parse_answer(raw)
+    assert status == "repaired"
+    assert answer.summary == "A strong year."
+
+
+def test_trailing_commas():
+    raw = '{"key_findings": ["Net sales grew 8%",], "detailed_analysis": "Growth.", "summary": "Strong.",}'
+    answer, status = parse_answer(raw)
+    assert status == "repaired"
+    assert answer.key_findings == ["Net sales grew 8%"]
+
+
+def test_truncated_completion():
+    raw = '{"key_findings": ["Net sales grew 8%", "Services margin wid'
+    answer, status = parse_answer(raw)
+    assert status == "repaired"
+    assert answer.key_findings == ["Net sales grew 8%", "Services margin wid"]
+
+
+def test_aliased_and_nested_keys():
+    raw = '{"answer": {"Findings": "- Net sales grew 8%\\n- Margins widened", "Conclusion": "Strong."}}'
+    answer, status = parse_answer(raw)
+    assert status == "repaired"
+    assert answer.key_findings == ["Net sales grew 8%", "Margins widened"]
+    assert answer.summary == "Strong."
+
+
+def test_legacy_headings():
+    raw = "1. **Key Findings:**\n- Net sales grew 8%\n\n2. Detailed Analysis\nGrowth came from Services.\n\n### Conclusion\nStrong."
+    answer, status = parse_answer(raw)
+    assert status == "legacy"
+    assert answer.key_findings == ["Net sales grew 8%"]
+    assert answer.detailed_analysis == "Growth came from Services."
+    assert answer.summary == "Strong."
+
+
+def test_unknown_keys_keep_their_text():
+    for raw, text in (('{"response": "Apple net sales grew 8%."}', "Apple net sales grew 8%."),
+                      ('{"answer": "Revenue grew."}', "Revenue grew.")):
+        answer, status = parse_answer(raw)
+        assert status == "repaired"
+        assert answer.detailed_analysis == text
+
+
+def test_unknown_keys_without_text_fall_back_to_raw():
+    raw = '{"confidence": 0.9}'
+    answer, status = parse_answer(raw)
+    assert status == "text"
+    assert answer.detailed_analysis == raw
+
+
+def test_plain_text():
+    answer, status = parse_answer("Net sales grew 8% on Services strength.")
+    assert status == "text"
+    assert answer.detailed_analysis == "Net sales grew 8% on Services strength."
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.fact_store import FactStore, format_fact
+
+STATEMENT = """CONSOLIDATED STATEMENTS OF OPERATIONS
+(In millions, except per share amounts)
+September 24, 2022 September 25, 2021 September 26, 2020
+Total net sales 394,328 365,817 274,515
+Research and development $ 26,251 $ 21,914 $ 18,752
+Other income/(expense), net (334) 258 803
+Net income $ 99,803 $ 94,680 $ 57,411
+Diluted $ 6.11 $ 5.61 $ 3.28
+"""
+
+
+@pytest.fixture(scope="module")
+def store():
+    return FactStore.from_pages([STATEMENT])
+
+
+def test_extracts_scaled_values(store):
+    assert store.lookup("research and development", 2021)["value"] == 21_914e6
+    assert store.lookup("other income expense net", 2022)["value"] == -334e6
+    assert store.lookup("diluted", 2020)["value"] == 3.28
+
+
+@pytest.mark.parametrize("question, period", [
+    ("What was R&D expense in 2022?", 2022),
+    ("How much was net income?", 2022),
+    ("net income 2020", 2020),
+])
+def test_answers_numeric_questions(store, question, period):
+    assert store.answer(question)["period"] == period
+
+
+@pytest.mark.parametrize("question", ["What is R&D?", "Explain net sales", "How did net income change?"])
+def test_leaves_other_questions_to_retrieval(store, question):
+    assert store.answer(question) is None
+
+
+def test_states_assumed_year(store):
+    assert "latest year reported, 2022" in format_fact(store.answer("What was net income?"))
+    assert "latest year" not in format_fact(store.answer("What was net income in 2021?"))
+
+
+def test_records_round_trip(store):
+    restored = FactStore.from_records(store.to_records())
+    assert restored.lookup("net income", 2021) == store.lookup("net income", 2021)
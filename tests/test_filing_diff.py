@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.filing_diff import diff_filings, stale_analysis_sections
+
+SECTION_SOURCES = {
+    "Risks": ["Risk Factors"],
+    "Business": ["Business"],
+    "Overview": None,
+}
+
+
+class StubFiling:
+    """Just the parts of a DocumentProcessor the diff reads"""
+
+    def __init__(self, sections):
+        self.chunks, self.sections = [], {}
+        for key, (title, text) in sections.items():
+            self.sections[key] = {"title": title, "start": len(self.chunks), "end": len(self.chunks) + 1}
+            self.chunks.append(text)
+
+    def matching_sections(self, names):
+        keys = []
+        for key, section in self.sections.items():
+            if any(name.lower() == key.lower() or name.lower() in section["title"].lower() for name in names or ()):
+                keys.append(key)
+        return keys
+
+
+BUSINESS = "The company designs, manufactures and markets smartphones, personal computers and wearables worldwide."
+RISKS = "Global economic conditions could materially adversely affect the company and its supply chain partners."
+
+
+def test_changed_source_marks_section_stale():
+    prior = StubFiling({"item1": ("Business", BUSINESS), "item1a": ("Risk Factors", RISKS)})
+    current = StubFiling({"item1": ("Business", BUSINESS),
+                          "item1a": ("Risk Factors", "New export controls and tariffs now restrict sales in several markets.")})
+    diff = diff_filings(prior, current)
+
+    assert stale_analysis_sections(diff, SECTION_SOURCES, prior, current) == {"Risks", "Overview"}
+
+
+def test_unchanged_filing_leaves_nothing_stale():
+    prior = StubFiling({"item1": ("Business", BUSINESS), "item1a": ("Risk Factors", RISKS)})
+    current = StubFiling({"item1": ("Business", BUSINESS), "item1a": ("Risk Factors", RISKS)})
+    diff = diff_filings(prior, current)
+
+    assert stale_analysis_sections(diff, SECTION_SOURCES, prior, current) == set()
+
+
+def test_section_without_matching_sources_follows_any_change():
+    prior = StubFiling({"item1": ("Business", BUSINESS)})
+    current = StubFiling({"item1": ("Business", BUSINESS), "item7": ("Management's Discussion", RISKS)})
+    diff = diff_filings(prior, current)
+
+    # Risk Factors matches nothing in either filing, so any change may affect it
+    assert stale_analysis_sections(diff, SECTION_SOURCES, prior, current) == {"Risks", "Overview"}
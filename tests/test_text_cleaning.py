@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.text_cleaning import strip_boilerplate
+
+CONTENTS = "\n".join([
+    "Table of Contents",
+    "Item 1. Business ............ 3",
+    "Item 1A. Risk Factors ........ 12",
+    "Item 7. Management's Discussion and Analysis ........ 25",
+])
+STATEMENT = "\n".join([
+    "Consolidated Statements of Operations",
+    "Net sales ..... 8,214",
+    "Other income, net ..... 258",
+    "Interest expense ..... 45",
+    "Net income ..... 1,902",
+])
+
+
+def test_contents_entries_are_dropped():
+    (page,), stats = strip_boilerplate([CONTENTS])
+    assert page == "Table of Contents"
+    assert stats["lines_removed"] == 3
+
+
+def test_dot_leader_table_rows_are_kept():
+    (page,), stats = strip_boilerplate([STATEMENT])
+    assert page == STATEMENT
+    assert stats["lines_removed"] == 0
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.token_budget import estimate_tokens, fit_to_budget
+
+
+def test_keeps_texts_in_order_within_budget():
+    texts = ["a" * 40, "b" * 40, "c" * 40]
+    selected, used = fit_to_budget(texts, 25)
+    assert selected == texts[:2]
+    assert used == sum(estimate_tokens(t) for t in selected) <= 25
+
+
+def test_oversized_first_text_is_truncated_not_dropped():
+    best = " ".join(["word"] * 2000)
+    selected, used = fit_to_budget([best, "short chunk"], 100)
+    assert selected and best.startswith(selected[0])
+    assert used <= 100
+
+
+def test_oversized_text_does_not_hide_smaller_ones():
+    texts = ["a" * 200, " ".join(["word"] * 2000), "b" * 40]
+    selected, used = fit_to_budget(texts, 80)
+    assert selected == [texts[0], texts[2]]
+    assert used <= 80
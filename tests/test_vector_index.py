@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import faiss
+import numpy as np
+import pytest
+
+from src.vector_index import (BACKENDS, COMPRESSIONS, add_vectors_with_ids, build_index, exclude_ids, index_memory_bytes, remove_vectors,
+                              search_params, supports_removal)
+
+DIMENSION = 32
+N_VECTORS = 512
+
+
+@pytest.fixture(scope="module")
+def embeddings():
+    return np.random.default_rng(0).standard_normal((N_VECTORS, DIMENSION)).astype('float32')
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_selector_search(embeddings, backend, compression):
+    index = build_index(embeddings, backend, compression)
+    start, end = 100, 150
+
+    params = search_params(index, faiss.IDSelectorRange(start, end))
+    _, indices = index.search(embeddings[:4], 5, params=params)
+    found = indices[indices >= 0]
+    assert len(found) and ((found >= start) & (found < end)).all()
+
+    allowed = np.array([3, 7, 300], dtype='int64')
+    params = search_params(index, faiss.IDSelectorBatch(allowed))
+    _, indices = index.search(embeddings[:1], 3, params=params)
+    assert set(indices[0][indices[0] >= 0]) <= set(allowed)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_selector_search_with_ids(embeddings, backend, compression):
+    ids = np.arange(N_VECTORS, dtype='int64') * 10
+    index = add_vectors_with_ids(None, embeddings, ids, backend, compression)
+    index = remove_vectors(index, ids[:10], compression)
+
+    allowed = ids[10:20]
+    params = search_params(index, faiss.IDSelectorBatch(allowed))
+    _, indices = index.search(embeddings[:2], 5, params=params)
+    # IVF only scans nprobe lists, so some slots may stay empty (-1)
+    assert set(indices[indices >= 0]) <= set(allowed)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_excluded_ids_are_skipped(embeddings, backend, compression):
+    ids = np.arange(N_VECTORS, dtype='int64') * 10
+    index = add_vectors_with_ids(None, embeddings, ids, backend, compression)
+    assert supports_removal(index) == (backend != "hnsw")
+
+    tombstones = ids[:N_VECTORS // 2]
+    params = search_params(index, exclude_ids(tombstones))
+    _, indices = index.search(embeddings[:4], 5, params=params)
+    found = indices[indices >= 0]
+    assert len(found) and not set(found) & set(tombstones)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_memory_estimate_matches_serialised_size(embeddings, backend, compression):
+    index = build_index(embeddings, backend, compression)
+    inner = faiss.downcast_index(index)
+    # Precomputed IVFPQ tables live in memory only
+    in_memory_only = inner.precomputed_table.size() * 4 if hasattr(inner, "precomputed_table") else 0
+    estimate = index_memory_bytes(index) - in_memory_only
+    assert estimate == pytest.approx(faiss.serialize_index(index).nbytes, rel=0.1)